@@ -0,0 +1,201 @@
+"""
+Lesson 57: NumPy — Batched MLP Inference
+
+Exercise 5's `np.maximum(0, input_batch @ weights + bias)` allocates two new
+arrays per layer per call. For serving a small classifier (e.g. intent
+routing) the same math can run allocation-free:
+
+- float32 weights (half the memory traffic of float64)
+- one preallocated buffer per layer, sized for the largest batch seen and
+  reused (sliced to the batch) via np.matmul(..., out=buf[:n])
+- bias add and activations applied in place (buf += b; np.maximum(buf, 0, out=buf))
+- a numerically stable softmax, also in place
+
+MicroBatcher collects single requests arriving from many threads into one
+batch (up to max_batch rows or max_wait seconds), since one (64, d) matmul
+is far cheaper than 64 (1, d) matmuls. benchmark() measures throughput
+versus batch size.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+
+def relu(x: np.ndarray) -> np.ndarray:
+    return np.maximum(x, 0, out=x)
+
+
+def tanh(x: np.ndarray) -> np.ndarray:
+    return np.tanh(x, out=x)
+
+
+def sigmoid(x: np.ndarray) -> np.ndarray:
+    np.negative(x, out=x)
+    np.exp(x, out=x)
+    x += 1
+    return np.reciprocal(x, out=x)
+
+
+def softmax(x: np.ndarray) -> np.ndarray:
+    """Row-wise softmax of a (batch, classes) array, in place."""
+    x -= x.max(axis=1, keepdims=True)
+    np.exp(x, out=x)
+    x /= x.sum(axis=1, keepdims=True)
+    return x
+
+
+def identity(x: np.ndarray) -> np.ndarray:
+    return x
+
+
+ACTIVATIONS = {"relu": relu, "tanh": tanh, "sigmoid": sigmoid, "softmax": softmax,
+               "linear": identity}
+
+
+class Dense:
+    """y = activation(x @ weights + bias), with float32 parameters."""
+
+    def __init__(self, weights: np.ndarray, bias: np.ndarray = None, activation: str = "relu"):
+        if activation not in ACTIVATIONS:
+            raise ValueError(f"activation must be one of {sorted(ACTIVATIONS)}, got {activation!r}")
+        self.weights = np.ascontiguousarray(weights, dtype=np.float32)
+        out_features = self.weights.shape[1]
+        self.bias = (np.zeros(out_features, dtype=np.float32) if bias is None
+                     else np.asarray(bias, dtype=np.float32).reshape(out_features))
+        self.activation = activation
+        self._activate = ACTIVATIONS[activation]
+
+    def forward(self, x: np.ndarray, out: np.ndarray) -> np.ndarray:
+        np.matmul(x, self.weights, out=out)
+        out += self.bias
+        return self._activate(out)
+
+
+class MLP:
+    """A stack of Dense layers with one reusable workspace per layer (not thread-safe)."""
+
+    def __init__(self, layers: list):
+        self.layers = layers
+        self._workspace_rows = 0
+        self._workspace = []    # one (rows, out_features) buffer per layer
+
+    @classmethod
+    def random(cls, sizes: list, hidden: str = "relu", output: str = "softmax",
+               seed: int = 0) -> "MLP":
+        """He-initialized network, e.g. MLP.random([384, 128, 64, 8])."""
+        rng = np.random.default_rng(seed)
+        layers = []
+        for i, (n_in, n_out) in enumerate(zip(sizes[:-1], sizes[1:])):
+            weights = rng.standard_normal((n_in, n_out)) * np.sqrt(2.0 / n_in)
+            layers.append(Dense(weights, None, output if i == len(sizes) - 2 else hidden))
+        return cls(layers)
+
+    def _buffers(self, batch: int) -> list:
+        """Per-layer output buffers for `batch` rows: views into the shared workspace."""
+        if batch > self._workspace_rows:
+            self._workspace = [np.empty((batch, layer.weights.shape[1]), dtype=np.float32)
+                               for layer in self.layers]
+            self._workspace_rows = batch
+        return [buf[:batch] for buf in self._workspace]
+
+    def predict(self, x: np.ndarray, max_batch: int = 256) -> np.ndarray:
+        """Forward pass over `x` (n, features) in batches of at most max_batch rows."""
+        x = np.atleast_2d(np.asarray(x, dtype=np.float32))
+        out = np.empty((len(x), self.layers[-1].weights.shape[1]), dtype=np.float32)
+        for start in range(0, len(x), max_batch):
+            batch = x[start:start + max_batch]
+            h = batch
+            for layer, buf in zip(self.layers, self._buffers(len(batch))):
+                h = layer.forward(h, buf)
+            out[start:start + len(batch)] = h
+        return out
+
+
+class MicroBatcher:
+    """
+    Thread-safe front end: submit(x) from any thread returns a Future; a
+    single worker thread runs the model on up to max_batch queued requests
+    at once, waiting at most max_wait seconds for a batch to fill.
+    """
+
+    def __init__(self, model: MLP, max_batch: int = 64, max_wait: float = 0.002):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.batches = 0
+        self._closed = False
+        self._lock = threading.Lock()   # no submit() may slip in behind close()'s stop marker
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, x: np.ndarray) -> Future:
+        future = Future()
+        item = (np.asarray(x, dtype=np.float32), future)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("MicroBatcher is closed")
+            self._queue.put(item)
+        return future
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            pending = [item]
+            deadline = time.monotonic() + self.max_wait
+            while len(pending) < self.max_batch:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)   # finish this batch, then stop
+                    break
+                pending.append(item)
+            try:
+                outputs = self.model.predict(np.stack([x for x, _ in pending]))
+            except Exception as exc:
+                for _, future in pending:
+                    future.set_exception(exc)
+            else:
+                for (_, future), row in zip(pending, outputs):
+                    future.set_result(row)
+            self.batches += 1
+
+    def close(self):
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def benchmark(model: MLP, in_features: int, batch_sizes=(1, 8, 32, 128, 512),
+              n_samples: int = 8192, seed: int = 0) -> list:
+    """Throughput (samples/s) and per-batch latency for each batch size."""
+    x = np.random.default_rng(seed).standard_normal((n_samples, in_features)).astype(np.float32)
+    rows = []
+    for batch in batch_sizes:
+        model.predict(x[:batch], max_batch=batch)   # warm up the workspace
+        start = time.perf_counter()
+        model.predict(x, max_batch=batch)
+        elapsed = time.perf_counter() - start
+        rows.append({
+            "batch": batch,
+            "samples_per_s": round(n_samples / elapsed),
+            "ms_per_batch": round(elapsed / -(-n_samples // batch) * 1000, 4),
+        })
+    return rows
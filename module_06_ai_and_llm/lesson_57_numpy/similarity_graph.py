@@ -0,0 +1,161 @@
+"""
+Lesson 57: NumPy — Blocked All-Pairs Similarity
+
+`normalized @ normalized.T` needs N x N floats: 10 GB at 50k documents.
+The same answers can be computed one tile at a time:
+
+- knn_graph(): for each block of rows, score it against one block of
+  columns at a time and keep a running top-k per row (rows whose k-th best
+  already beats the whole tile skip the selection). Memory is
+  block_rows x (block_cols + k) floats, whatever N is.
+- threshold_pairs(): every pair (i < j) scoring >= threshold, visiting only
+  the upper-triangle tiles.
+
+Row blocks are independent, so knn_graph(..., n_workers=4) hands them to a
+process pool. The vectors are placed in shared memory once, not copied to
+each worker. The pool uses the platform's default start method unless
+mp_context says otherwise; under spawn the calling script must keep its
+top-level code under `if __name__ == "__main__":`.
+
+The k-NN result is a sparse graph in CSR form (indptr, indices, scores), the
+layout scipy.sparse.csr_matrix((scores, indices, indptr)) accepts directly.
+"""
+
+import multiprocessing
+from multiprocessing import shared_memory
+from typing import NamedTuple
+
+import numpy as np
+from cosine_kernels import normalize_rows
+
+
+class KNNGraph(NamedTuple):
+    """Row i's neighbours are indices[indptr[i]:indptr[i + 1]], best first."""
+
+    indptr: np.ndarray
+    indices: np.ndarray
+    scores: np.ndarray
+
+    def neighbors(self, i: int) -> tuple:
+        lo, hi = self.indptr[i], self.indptr[i + 1]
+        return self.indices[lo:hi], self.scores[lo:hi]
+
+    def edges(self) -> tuple:
+        """(source, target, score) arrays, one entry per edge."""
+        sources = np.repeat(np.arange(len(self.indptr) - 1), np.diff(self.indptr))
+        return sources, self.indices, self.scores
+
+
+def _top_k_merge(best_cols, best_scores, scores, col_start, k) -> tuple:
+    """Merge a tile's scores into a running top-k (unordered) per row."""
+    if scores.shape[1] > k:
+        cols = np.argpartition(scores, -k, axis=1)[:, -k:]
+        scores = np.take_along_axis(scores, cols, axis=1)
+    else:
+        cols = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    scores = np.concatenate([best_scores, scores], axis=1)
+    cols = np.concatenate([best_cols, cols + col_start], axis=1)
+    if scores.shape[1] > k:
+        keep = np.argpartition(scores, -k, axis=1)[:, -k:]
+        scores = np.take_along_axis(scores, keep, axis=1)
+        cols = np.take_along_axis(cols, keep, axis=1)
+    return cols, scores
+
+
+def _block_top_k(vectors: np.ndarray, start: int, end: int, k: int, block_cols: int,
+                 exclude_self: bool) -> tuple:
+    """Top-k (columns, scores) for rows [start, end), best first, one column tile at a time."""
+    rows = vectors[start:end]
+    best_cols = np.empty((end - start, 0), dtype=np.int64)
+    best_scores = np.empty((end - start, 0), dtype=np.float32)
+    for col_start in range(0, len(vectors), block_cols):
+        col_end = min(col_start + block_cols, len(vectors))
+        scores = rows @ vectors[col_start:col_end].T
+        if exclude_self:
+            diag = np.arange(max(start, col_start), min(end, col_end))
+            scores[diag - start, diag - col_start] = -np.inf
+        if best_scores.shape[1] < k:
+            best_cols, best_scores = _top_k_merge(best_cols, best_scores, scores, col_start, k)
+            continue
+        # Only rows where this tile beats the current k-th best need a re-selection;
+        # after the first few tiles that is usually a small minority.
+        active = np.flatnonzero((scores > best_scores.min(axis=1)[:, None]).any(axis=1))
+        if len(active):
+            best_cols[active], best_scores[active] = _top_k_merge(
+                best_cols[active], best_scores[active], scores[active], col_start, k
+            )
+    order = np.argsort(-best_scores, axis=1, kind="stable")
+    return (np.take_along_axis(best_cols, order, axis=1),
+            np.take_along_axis(best_scores, order, axis=1))
+
+
+_shared = None   # worker-side view of the shared vectors
+_shm = None
+
+
+def _init_worker(name: str, shape: tuple, dtype: str):
+    global _shared, _shm
+    _shm = shared_memory.SharedMemory(name=name)
+    _shared = np.ndarray(shape, dtype=dtype, buffer=_shm.buf)
+
+
+def _worker_block(task: tuple) -> tuple:
+    return _block_top_k(_shared, *task)
+
+
+def knn_graph(vectors: np.ndarray, k: int = 10, block_rows: int = 1024,
+              block_cols: int = 8192, exclude_self: bool = True,
+              n_workers: int = None, normalized: bool = False,
+              mp_context=None) -> KNNGraph:
+    """
+    Cosine k-nearest-neighbour graph of the rows of `vectors`.
+    Pass normalized=True when the rows already have unit length.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32) if normalized else normalize_rows(vectors)
+    n = len(vectors)
+    k = min(k, n - 1 if exclude_self else n)
+    if k <= 0:
+        return KNNGraph(np.zeros(n + 1, dtype=np.int64), np.empty(0, dtype=np.int64),
+                        np.empty(0, dtype=np.float32))
+    blocks = [(s, min(s + block_rows, n), k, block_cols, exclude_self)
+              for s in range(0, n, block_rows)]
+    if n_workers and n_workers > 1 and len(blocks) > 1:
+        shm = shared_memory.SharedMemory(create=True, size=max(vectors.nbytes, 1))
+        try:
+            np.ndarray(vectors.shape, dtype=vectors.dtype, buffer=shm.buf)[:] = vectors
+            initargs = (shm.name, vectors.shape, vectors.dtype.str)
+            ctx = mp_context or multiprocessing.get_context()
+            with ctx.Pool(n_workers, _init_worker, initargs) as pool:
+                results = pool.map(_worker_block, blocks)
+        finally:
+            shm.close()
+            shm.unlink()
+    else:
+        results = [_block_top_k(vectors, *task) for task in blocks]
+
+    indices = np.concatenate([cols for cols, _ in results])
+    scores = np.concatenate([s for _, s in results])
+    valid = np.isfinite(scores)   # fewer than k real neighbours (tiny inputs)
+    indptr = np.concatenate([[0], np.cumsum(valid.sum(axis=1))]).astype(np.int64)
+    return KNNGraph(indptr, indices[valid].astype(np.int64), scores[valid].astype(np.float32))
+
+
+def threshold_pairs(vectors: np.ndarray, threshold: float, block_rows: int = 2048,
+                    normalized: bool = False) -> tuple:
+    """All pairs i < j with cosine similarity >= threshold, as (i, j, score) arrays."""
+    vectors = np.asarray(vectors, dtype=np.float32) if normalized else normalize_rows(vectors)
+    n = len(vectors)
+    found_i, found_j, found_s = [], [], []
+    for r0 in range(0, n, block_rows):
+        rows = vectors[r0:r0 + block_rows]
+        for c0 in range(r0, n, block_rows):   # upper-triangle tiles only
+            scores = rows @ vectors[c0:c0 + block_rows].T
+            ii, jj = np.nonzero(scores >= threshold)
+            ii, jj = ii + r0, jj + c0
+            upper = ii < jj
+            found_i.append(ii[upper])
+            found_j.append(jj[upper])
+            found_s.append(scores[ii[upper] - r0, jj[upper] - c0])
+    if not found_i:
+        return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.float32)
+    return np.concatenate(found_i), np.concatenate(found_j), np.concatenate(found_s)
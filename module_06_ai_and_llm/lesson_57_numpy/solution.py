@@ -2,19 +2,29 @@
 Lesson 57: NumPy — Solutions
 """
 
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 
+from cosine_kernels import cosine_one_to_many, row_norms
+from mlp_inference import MLP, Dense, MicroBatcher, benchmark
+from similarity_graph import knn_graph, threshold_pairs
+from streaming_stats import RunningStats, filter_outliers, iter_chunks, preprocess
+
 
 # ===========================================================
 # SOLUTION 1: Cosine Similarity
 # ===========================================================
-query = np.array([0.5, 0.8, -0.2, 0.3])
-documents = {
-    "Python tutorial": np.array([0.6, 0.7, -0.1, 0.4]),
-    "JavaScript basics": np.array([0.4, 0.6, 0.1, 0.5]),
-    "Cooking recipes": np.array([-0.8, 0.1, 0.9, -0.5]),
-    "Machine learning intro": np.array([0.7, 0.9, -0.3, 0.2]),
-}
+if __name__ == "__main__":
+    query = np.array([0.5, 0.8, -0.2, 0.3])
+    documents = {
+        "Python tutorial": np.array([0.6, 0.7, -0.1, 0.4]),
+        "JavaScript basics": np.array([0.4, 0.6, 0.1, 0.5]),
+        "Cooking recipes": np.array([-0.8, 0.1, 0.9, -0.5]),
+        "Machine learning intro": np.array([0.7, 0.9, -0.3, 0.2]),
+    }
+
 
 def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
     dot_product = np.dot(a, b)
@@ -23,17 +33,20 @@ def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
     return dot_product / (norm_a * norm_b)
 
 
-print("=" * 50)
-print("Exercise 1: Cosine Similarity for Document Search")
-print("=" * 50)
-similarities = {}
-for doc_name, doc_embedding in documents.items():
-    sim = cosine_similarity(query, doc_embedding)
-    similarities[doc_name] = sim
-    print(f"  {doc_name}: {sim:.4f}")
+if __name__ == "__main__":
+    print("=" * 50)
+    print("Exercise 1: Cosine Similarity for Document Search")
+    print("=" * 50)
+    # Score every document in one call instead of looping over cosine_similarity()
+    doc_matrix = np.stack(list(documents.values())).astype(np.float32)
+    sims = cosine_one_to_many(query, doc_matrix)
+    similarities = dict(zip(documents, sims.tolist()))
+    for doc_name, sim in similarities.items():
+        print(f"  {doc_name}: {sim:.4f}")
 
-best = max(similarities, key=similarities.get)
-print(f"\nMost similar document: '{best}'")
+    best = max(similarities, key=similarities.get)
+    print(f"\nMost similar document: '{best}'")
+    print(f"Same score from the two-vector version: {cosine_similarity(query, documents[best]):.4f}")
 
 
 # ===========================================================
@@ -46,96 +59,234 @@ def softmax(logits: np.ndarray) -> np.ndarray:
     return exp_scores / exp_scores.sum()
 
 
-print("\n" + "=" * 50)
-print("Exercise 2: Softmax")
-print("=" * 50)
-logits = np.array([3.2, 1.5, 0.8, -0.5])
-probs = softmax(logits)
-labels = ["Python", "JavaScript", "Java", "C++"]
-for label, prob in zip(labels, probs):
-    print(f"  {label}: {prob:.1%}")
-print(f"  Sum: {probs.sum():.4f}")
+if __name__ == "__main__":
+    print("\n" + "=" * 50)
+    print("Exercise 2: Softmax")
+    print("=" * 50)
+    logits = np.array([3.2, 1.5, 0.8, -0.5])
+    probs = softmax(logits)
+    labels = ["Python", "JavaScript", "Java", "C++"]
+    for label, prob in zip(labels, probs):
+        print(f"  {label}: {prob:.1%}")
+    print(f"  Sum: {probs.sum():.4f}")
 
 
 # ===========================================================
 # SOLUTION 3: Batch Embedding Operations
 # ===========================================================
-np.random.seed(42)
-embeddings = np.random.randn(5, 6)
-doc_names = ["Doc A", "Doc B", "Doc C", "Doc D", "Doc E"]
+if __name__ == "__main__":
+    np.random.seed(42)
+    embeddings = np.random.randn(5, 6)
+    doc_names = ["Doc A", "Doc B", "Doc C", "Doc D", "Doc E"]
 
-print("\n" + "=" * 50)
-print("Exercise 3: Batch Embedding Operations")
-print("=" * 50)
+    print("\n" + "=" * 50)
+    print("Exercise 3: Batch Embedding Operations")
+    print("=" * 50)
 
-# Step 1: Compute L2 norms
-norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
-print(f"Norms shape: {norms.shape}")
+    # Step 1: Compute L2 norms
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    print(f"Norms shape: {norms.shape}")
 
-# Step 2: Normalize
-normalized = embeddings / norms
+    # Step 2: Normalize
+    normalized = embeddings / norms
 
-# Step 3: Compute similarity matrix
-similarity_matrix = normalized @ normalized.T
-print(f"Similarity matrix shape: {similarity_matrix.shape}")
+    # Step 3: Compute similarity matrix
+    similarity_matrix = normalized @ normalized.T
+    print(f"Similarity matrix shape: {similarity_matrix.shape}")
 
-# Step 4: Find most similar pair (excluding diagonal)
-sim_copy = similarity_matrix.copy()
-np.fill_diagonal(sim_copy, -np.inf)  # exclude same-doc pairs
-max_idx = np.unravel_index(np.argmax(sim_copy), sim_copy.shape)
-i, j = max_idx
-print(f"Most similar pair: '{doc_names[i]}' and '{doc_names[j]}' "
-      f"(similarity: {similarity_matrix[i, j]:.4f})")
+    # Step 4: Find most similar pair (excluding diagonal)
+    sim_copy = similarity_matrix.copy()
+    np.fill_diagonal(sim_copy, -np.inf)  # exclude same-doc pairs
+    max_idx = np.unravel_index(np.argmax(sim_copy), sim_copy.shape)
+    i, j = max_idx
+    print(f"Most similar pair: '{doc_names[i]}' and '{doc_names[j]}' "
+          f"(similarity: {similarity_matrix[i, j]:.4f})")
 
 
 # ===========================================================
 # SOLUTION 4: Data Preprocessing
 # ===========================================================
-raw_scores = np.array([
-    0.82, 0.79, 0.88, 0.91, 0.76, 0.85, 0.02, 0.83,
-    0.78, 0.95, 0.89, 0.99, 0.81, 0.03, 0.87, 0.92
-])
+if __name__ == "__main__":
+    raw_scores = np.array([
+        0.82, 0.79, 0.88, 0.91, 0.76, 0.85, 0.02, 0.83,
+        0.78, 0.95, 0.89, 0.99, 0.81, 0.03, 0.87, 0.92
+    ])
 
-print("\n" + "=" * 50)
-print("Exercise 4: Data Preprocessing")
-print("=" * 50)
+    print("\n" + "=" * 50)
+    print("Exercise 4: Data Preprocessing")
+    print("=" * 50)
 
-print(f"Original: mean={raw_scores.mean():.3f}, std={raw_scores.std():.3f}, "
-      f"min={raw_scores.min():.3f}, max={raw_scores.max():.3f}, n={len(raw_scores)}")
+    print(f"Original: mean={raw_scores.mean():.3f}, std={raw_scores.std():.3f}, "
+          f"min={raw_scores.min():.3f}, max={raw_scores.max():.3f}, n={len(raw_scores)}")
 
-# Remove outliers
-mean = raw_scores.mean()
-std = raw_scores.std()
-clean_scores = raw_scores[np.abs(raw_scores - mean) <= 2 * std]
-print(f"After outlier removal: n={len(clean_scores)} (removed {len(raw_scores) - len(clean_scores)} outliers)")
+    # Remove outliers
+    mean = raw_scores.mean()
+    std = raw_scores.std()
+    clean_scores = raw_scores[np.abs(raw_scores - mean) <= 2 * std]
+    print(f"After outlier removal: n={len(clean_scores)} (removed {len(raw_scores) - len(clean_scores)} outliers)")
 
-# Min-max normalization
-normalized_scores = (clean_scores - clean_scores.min()) / (clean_scores.max() - clean_scores.min())
-print(f"Normalized: mean={normalized_scores.mean():.3f}, min={normalized_scores.min():.3f}, max={normalized_scores.max():.3f}")
+    # Min-max normalization
+    normalized_scores = (clean_scores - clean_scores.min()) / (clean_scores.max() - clean_scores.min())
+    print(f"Normalized: mean={normalized_scores.mean():.3f}, min={normalized_scores.min():.3f}, max={normalized_scores.max():.3f}")
 
 
 # ===========================================================
 # SOLUTION 5: Neural Network Layer
 # ===========================================================
-print("\n" + "=" * 50)
-print("Exercise 5: Neural Network Layer (Matrix Math)")
-print("=" * 50)
+if __name__ == "__main__":
+    print("\n" + "=" * 50)
+    print("Exercise 5: Neural Network Layer (Matrix Math)")
+    print("=" * 50)
+
+    np.random.seed(42)
+
+    # Weights: shape (input_features=4, output_features=3)
+    weights = np.random.randn(4, 3)
+    bias = np.zeros(3)
+    input_batch = np.random.randn(5, 4)  # 5 samples, 4 features
+
+    # Linear transformation: output = input @ weights + bias
+    layer_output = input_batch @ weights + bias  # shape (5, 3)
+
+    # ReLU activation: max(0, x)
+    activated_output = np.maximum(0, layer_output)
+
+    print(f"Input shape:  {input_batch.shape}")
+    print(f"Weight shape: {weights.shape}")
+    print(f"Output shape: {layer_output.shape}")
+    print(f"\nOutput after ReLU (negatives become 0):")
+    print(np.round(activated_output, 3))
 
-np.random.seed(42)
 
-# Weights: shape (input_features=4, output_features=3)
-weights = np.random.randn(4, 3)
-bias = np.zeros(3)
-input_batch = np.random.randn(5, 4)  # 5 samples, 4 features
+# ===========================================================
+# BONUS: Blocked All-Pairs Similarity / k-NN Graph
+# ===========================================================
+if __name__ == "__main__":
+    print("\n" + "=" * 50)
+    print("Bonus: Blocked k-NN Graph (no N x N matrix)")
+    print("=" * 50)
+    graph = knn_graph(embeddings, k=1)
+    sources, targets, scores = graph.edges()
+    best_edge = np.argmax(scores)
+    i, j = sources[best_edge], targets[best_edge]
+    print(f"Most similar pair (k-NN graph): '{doc_names[i]}' and '{doc_names[j]}' "
+          f"(similarity: {scores[best_edge]:.4f})")
+
+    rng = np.random.default_rng(0)
+    many = rng.standard_normal((10_000, 64)).astype(np.float32)
+    many[5_000:5_050] = many[:50] + 0.05 * rng.standard_normal((50, 64))   # planted near-duplicates
+    start = time.perf_counter()
+    big_graph = knn_graph(many, k=5, block_rows=1024, block_cols=2048)
+    print(f"{len(many):,} vectors, k=5 graph with {len(big_graph.indices):,} edges "
+          f"in {time.perf_counter() - start:.2f}s "
+          f"(full matrix would be {len(many) ** 2 * 4 / 2**30:.1f} GB, tiles are "
+          f"{1024 * 2048 * 4 / 2**20:.0f} MB)")
+    dup_i, dup_j, dup_scores = threshold_pairs(many, 0.95)
+    print(f"Pairs with similarity >= 0.95: {len(dup_i)} (planted: 50)")
+
+    start = time.perf_counter()
+    pooled = knn_graph(many, k=5, block_rows=1024, block_cols=2048, n_workers=4)
+    print(f"Same graph with 4 worker processes in {time.perf_counter() - start:.2f}s: "
+          f"{np.array_equal(pooled.indices, big_graph.indices)}")
+
+
+# ===========================================================
+# BONUS: Vectorized Cosine Kernels
+# ===========================================================
+if __name__ == "__main__":
+    print("\n" + "=" * 50)
+    print("Bonus: Loop vs Vectorized Cosine Similarity")
+    print("=" * 50)
+    corpus = rng.standard_normal((20_000, 128)).astype(np.float32)
+    probe = rng.standard_normal(128).astype(np.float32)
+    start = time.perf_counter()
+    looped = [cosine_similarity(probe, row) for row in corpus]
+    loop_time = time.perf_counter() - start
+
+    corpus_norms = row_norms(corpus)                       # computed once per corpus
+    scores_buf = np.empty(len(corpus), dtype=np.float32)   # reused for every query
+    start = time.perf_counter()
+    for _ in range(10):
+        cosine_one_to_many(probe, corpus, norms=corpus_norms, out=scores_buf)
+    kernel_time = (time.perf_counter() - start) / 10
+    print(f"{len(corpus):,} documents: loop {loop_time * 1000:.1f} ms, "
+          f"kernel {kernel_time * 1000:.2f} ms ({loop_time / kernel_time:.0f}x), "
+          f"max difference {np.max(np.abs(scores_buf - looped)):.1e}")
+
+
+# ===========================================================
+# BONUS: Streaming Statistics (constant memory)
+# ===========================================================
+if __name__ == "__main__":
+    print("\n" + "=" * 50)
+    print("Bonus: Streaming Preprocessing")
+    print("=" * 50)
+    # Same recipe as Solution 4, but reading raw_scores 4 values at a time
+    everything, clean, normalized_chunks = preprocess(lambda: iter_chunks(raw_scores.tolist(), 4))
+    streamed = np.concatenate(list(normalized_chunks))
+    print(f"Streamed: n={clean.count} (removed {everything.count - clean.count} outliers), "
+          f"mean={streamed.mean():.3f}, matches Solution 4: {np.allclose(streamed, normalized_scores)}")
+
+
+def score_feed(n_chunks: int, seed: int):
+    """A generator standing in for an endless score feed: 1M scores per chunk, ~0.1% junk."""
+    feed_rng = np.random.default_rng(seed)
+    for _ in range(n_chunks):
+        chunk = np.clip(feed_rng.normal(0.8, 0.05, 1_000_000), 0, 1)
+        chunk[feed_rng.random(len(chunk)) < 0.001] = 0.01
+        yield chunk
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    # Four "workers" each summarize their own slice; the partial results are merged
+    partials = [RunningStats.from_chunks(score_feed(2, seed), seed=seed) for seed in range(4)]
+    feed_stats = RunningStats(seed=0)
+    for partial in partials:
+        feed_stats.merge(partial)
+    print(f"{feed_stats.count:,} scores in {time.perf_counter() - start:.2f}s: {feed_stats}")
+    p01, p50, p99 = feed_stats.quantile([0.01, 0.5, 0.99])
+    print(f"Approximate quantiles: p1={p01:.3f}, p50={p50:.3f}, p99={p99:.3f}")
+    kept = sum(len(chunk) for chunk in filter_outliers(score_feed(2, seed=9), n_std=3))
+    print(f"One-pass outlier filter kept {kept:,} of 2,000,000 scores")
+
+
+# ===========================================================
+# BONUS: Batched MLP Inference
+# ===========================================================
+if __name__ == "__main__":
+    print("\n" + "=" * 50)
+    print("Bonus: Batched MLP Inference")
+    print("=" * 50)
+    # Solution 5's layer, run through preallocated float32 workspaces
+    engine = MLP([Dense(weights, bias, "relu")])
+    print(f"Engine matches Solution 5: "
+          f"{np.allclose(engine.predict(input_batch), activated_output, atol=1e-5)}")
 
-# Linear transformation: output = input @ weights + bias
-layer_output = input_batch @ weights + bias  # shape (5, 3)
+    # A small intent router: 384-dim sentence embedding -> 8 intents
+    router = MLP.random([384, 128, 64, 8], seed=0)
+    requests = rng.standard_normal((1_000, 384)).astype(np.float32)
+    probs = router.predict(requests)
+    reference = requests.astype(np.float64)
+    for layer in router.layers[:-1]:
+        reference = np.maximum(0, reference @ layer.weights + layer.bias)
+    logits = reference @ router.layers[-1].weights + router.layers[-1].bias
+    reference = np.exp(logits - logits.max(axis=1, keepdims=True))
+    reference /= reference.sum(axis=1, keepdims=True)
+    print(f"Router: {len(requests)} requests, rows sum to 1: {np.allclose(probs.sum(axis=1), 1)}, "
+          f"same as float64 reference: {np.allclose(probs, reference, atol=1e-4)}")
 
-# ReLU activation: max(0, x)
-activated_output = np.maximum(0, layer_output)
+    print(f"\n{'batch':>6} {'samples/s':>12} {'ms/batch':>10}")
+    for row in benchmark(router, 384, batch_sizes=(1, 8, 32, 128, 512)):
+        print(f"{row['batch']:>6} {row['samples_per_s']:>12,} {row['ms_per_batch']:>10.3f}")
 
-print(f"Input shape:  {input_batch.shape}")
-print(f"Weight shape: {weights.shape}")
-print(f"Output shape: {layer_output.shape}")
-print(f"\nOutput after ReLU (negatives become 0):")
-print(np.round(activated_output, 3))
+    # Single requests from 8 client threads, grouped by the micro-batcher
+    with MicroBatcher(router, max_batch=64, max_wait=0.002) as batcher:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(8) as clients:
+            futures = list(clients.map(batcher.submit, requests))
+        answers = np.stack([future.result() for future in futures])
+        elapsed = time.perf_counter() - start
+    print(f"\nMicro-batched: {len(requests)} single requests in {batcher.batches} batches, "
+          f"{len(requests) / elapsed:,.0f} requests/s, matches batch predict: "
+          f"{np.allclose(answers, probs, atol=1e-6)}")
@@ -0,0 +1,187 @@
+"""
+Lesson 57: NumPy — Streaming Statistics
+
+raw_scores.mean() / .std() / .min() need the whole array in memory. For an
+unbounded feed, process it chunk by chunk and keep only a few numbers:
+
+RunningStats        count, mean, variance (Welford / Chan et al. chunk update),
+                    min, max, plus approximate quantiles from a fixed-size
+                    reservoir sample. merge() combines partial results, so
+                    workers can each summarize a slice of the feed.
+filter_outliers()   one pass: drop values more than n_std standard deviations
+                    from the running mean (after a warm-up buffer)
+minmax_chunks()     chunked (x - lo) / (hi - lo), written in place
+preprocess()        the exact whole-array recipe (outlier removal, then
+                    min-max) in three streaming passes over a re-readable source
+
+Memory is O(chunk size + reservoir size), independent of the stream length.
+"""
+
+from itertools import islice
+
+import numpy as np
+
+
+def iter_chunks(values, size: int = 1 << 20):
+    """Group any iterable of numbers (or of arrays) into float64 arrays of about `size`."""
+    it = iter(values)
+    while True:
+        first = next(it, None)
+        if first is None:
+            return
+        if np.ndim(first):   # already chunked
+            yield np.asarray(first, dtype=np.float64)
+            for chunk in it:
+                yield np.asarray(chunk, dtype=np.float64)
+            return
+        rest = np.fromiter(islice(it, size - 1), dtype=np.float64)
+        yield np.concatenate([[first], rest])
+
+
+class RunningStats:
+    """Mergeable count / mean / variance / min / max / reservoir quantiles."""
+
+    def __init__(self, reservoir_size: int = 10_000, seed: int = None):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0                # sum of squared deviations from the mean
+        self.min = np.inf
+        self.max = -np.inf
+        self.reservoir_size = reservoir_size
+        self._rng = np.random.default_rng(seed)
+        self._sample = np.empty(0, dtype=np.float64)
+
+    def update(self, chunk) -> "RunningStats":
+        chunk = np.asarray(chunk, dtype=np.float64).ravel()
+        n = len(chunk)
+        if n == 0:
+            return self
+        mean_b = chunk.mean()
+        m2_b = np.square(chunk - mean_b).sum()
+        self._combine(n, mean_b, m2_b, chunk.min(), chunk.max())
+        self._sample_chunk(chunk)
+        self.count += n
+        return self
+
+    def _combine(self, n_b: int, mean_b: float, m2_b: float, min_b: float, max_b: float):
+        total = self.count + n_b
+        delta = mean_b - self.mean
+        self.mean += delta * n_b / total
+        self.m2 += m2_b + delta * delta * self.count * n_b / total
+        self.min = min(self.min, min_b)
+        self.max = max(self.max, max_b)
+
+    def _sample_chunk(self, chunk: np.ndarray):
+        # Algorithm R, vectorized: the i-th value seen replaces slot j ~ U[0, i) if j < size
+        filled = min(self.reservoir_size - len(self._sample), len(chunk))
+        if filled:
+            self._sample = np.concatenate([self._sample, chunk[:filled]])
+        rest = chunk[filled:]
+        if len(rest) == 0:
+            return
+        positions = np.arange(self.count + filled + 1, self.count + len(chunk) + 1)
+        slots = (self._rng.random(len(rest)) * positions).astype(np.int64)
+        accepted = slots < self.reservoir_size
+        self._sample[slots[accepted]] = rest[accepted]
+
+    def merge(self, other: "RunningStats") -> "RunningStats":
+        """Fold another partial result (e.g. from a worker) into this one."""
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.mean, self.m2 = other.mean, other.m2
+            self.min, self.max = other.min, other.max
+            self._sample = other._sample.copy()
+            self.count = other.count
+            return self
+        # Each slot of the merged sample comes from a side in proportion to its count
+        share = self.count / (self.count + other.count)
+        take_self = min(self._rng.binomial(self.reservoir_size, share), len(self._sample))
+        take_other = min(self.reservoir_size - take_self, len(other._sample))
+        self._sample = np.concatenate([
+            self._rng.choice(self._sample, take_self, replace=False),
+            self._rng.choice(other._sample, take_other, replace=False),
+        ])
+        self._combine(other.count, other.mean, other.m2, other.min, other.max)
+        self.count += other.count
+        return self
+
+    @classmethod
+    def from_chunks(cls, chunks, **kwargs) -> "RunningStats":
+        stats = cls(**kwargs)
+        for chunk in chunks:
+            stats.update(chunk)
+        return stats
+
+    @property
+    def variance(self) -> float:
+        """Population variance (same as np.var / np.std's default ddof=0)."""
+        return self.m2 / self.count if self.count else float("nan")
+
+    @property
+    def std(self) -> float:
+        return float(np.sqrt(self.variance))
+
+    def quantile(self, q):
+        """Approximate quantile(s) from the reservoir (rank error ~ 1/sqrt(reservoir_size))."""
+        if len(self._sample) == 0:
+            return float("nan")
+        return np.quantile(self._sample, q)
+
+    def __repr__(self):
+        return (f"RunningStats(n={self.count}, mean={self.mean:.4g}, std={self.std:.4g}, "
+                f"min={self.min:.4g}, max={self.max:.4g})")
+
+
+def filter_outliers(chunks, n_std: float = 2.0, warmup: int = 10_000,
+                    stats: RunningStats = None):
+    """
+    One pass: yield each chunk without values further than n_std standard
+    deviations from the running mean. The first `warmup` values are held
+    back until the estimate has settled. Pass `stats` to inspect it afterwards.
+    """
+    stats = stats if stats is not None else RunningStats()
+    held = []
+    for chunk in chunks:
+        stats.update(chunk)
+        if stats.count < warmup:
+            held.append(chunk)
+            continue
+        if held:
+            chunk = np.concatenate(held + [chunk])
+            held = []
+        yield chunk[np.abs(chunk - stats.mean) <= n_std * stats.std]
+    if held:
+        chunk = np.concatenate(held)
+        yield chunk[np.abs(chunk - stats.mean) <= n_std * stats.std]
+
+
+def minmax_chunks(chunks, lo: float, hi: float):
+    """Yield (x - lo) / (hi - lo) for every chunk, computed in place (chunks are overwritten)."""
+    scale = 1.0 / (hi - lo) if hi > lo else 0.0
+    for chunk in chunks:
+        chunk = np.asarray(chunk, dtype=np.float64)
+        chunk -= lo
+        chunk *= scale
+        yield chunk
+
+
+def preprocess(make_chunks, n_std: float = 2.0):
+    """
+    Exact streaming version of "drop values beyond n_std std, then min-max":
+    `make_chunks()` must return a fresh iterator over the data on every call.
+      pass 1: mean / std of everything
+      pass 2: min / max of the values that survive the outlier filter
+      pass 3: yield the surviving values, min-max normalized, chunk by chunk
+    Returns (stats of all values, stats of the kept values, generator of chunks).
+    """
+    everything = RunningStats.from_chunks(make_chunks())
+    mean, limit = everything.mean, n_std * everything.std
+
+    def kept():
+        for chunk in make_chunks():
+            chunk = np.asarray(chunk, dtype=np.float64)
+            yield chunk[np.abs(chunk - mean) <= limit]
+
+    clean = RunningStats.from_chunks(kept())
+    return everything, clean, minmax_chunks(kept(), clean.min, clean.max)
@@ -0,0 +1,207 @@
+"""
+Lesson 59: Vector Embeddings — Retrieval Benchmark
+
+Measures every search backend on the same synthetic corpus and reports:
+build time, index memory, QPS, p50/p95/p99 latency and recall@k against
+exact brute-force search.
+
+Corpus vectors come from fake_embeddings.embed_many (deterministic per text);
+queries are corpus vectors plus Gaussian noise, so each has real neighbours.
+
+Run from this folder:
+    python benchmark.py --sizes 10000,100000 --dims 64 --k 10 \\
+        --backends flat "ivf:n_lists=256,nprobe=8" "hnsw:M=16,ef_search=64" \\
+        "sq8:rerank=100" "pq:m=8,rerank=200"
+
+Backend specs are name[:param=value,...]; the params go to the index constructor.
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+from fake_embeddings import embed_many
+from hnsw_index import HNSWIndex
+from ivf_index import IVFIndex
+from quantization import ProductQuantizer, QuantizedIndex, ScalarQuantizer
+from vector_math import normalize_rows, running_top_k, top_k_indices
+
+GENERATE_BATCH = 100_000   # texts embedded at a time while building a corpus
+
+
+class FlatIndex:
+    """Exact brute-force scan, in the same train/add/search protocol as the real indexes."""
+
+    def train(self, vectors: np.ndarray):
+        pass
+
+    def add(self, vectors: np.ndarray, start: int = 0):
+        pass
+
+    def search(self, vectors: np.ndarray, query: np.ndarray, top_k: int = 5) -> tuple:
+        scores = vectors @ query
+        best = top_k_indices(scores, top_k)
+        return best, scores[best]
+
+
+BACKENDS = {
+    "flat": FlatIndex,
+    "ivf": IVFIndex,
+    "hnsw": HNSWIndex,
+    "sq8": lambda **kw: QuantizedIndex(ScalarQuantizer(), **kw),
+    "pq": lambda m=8, ks=256, **kw: QuantizedIndex(ProductQuantizer(m=m, ks=ks), **kw),
+}
+
+
+def deep_sizeof(obj, seen: set = None) -> int:
+    """Approximate bytes held by an index: arrays, containers and object attributes."""
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes if obj.base is None else 0   # views share their base's memory
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(k, seen) + deep_sizeof(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += deep_sizeof(vars(obj), seen)
+    return size
+
+
+def make_corpus(n: int, dims: int = 64, prefix: str = "doc") -> np.ndarray:
+    """(n, dims) float32 unit vectors for the texts f"{prefix} {i}", generated in batches."""
+    out = np.empty((n, dims), dtype=np.float32)
+    for start in range(0, n, GENERATE_BATCH):
+        end = min(start + GENERATE_BATCH, n)
+        out[start:end] = embed_many([f"{prefix} {i}" for i in range(start, end)], dims)
+    return out
+
+
+def make_queries(corpus: np.ndarray, n_queries: int, noise: float = 0.5,
+                 seed: int = 0) -> np.ndarray:
+    """Noisy copies of random corpus rows (noise is relative to a unit vector's length)."""
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(corpus), size=n_queries, replace=n_queries > len(corpus))
+    jitter = rng.standard_normal((n_queries, corpus.shape[1])).astype(np.float32)
+    jitter *= noise / np.sqrt(corpus.shape[1])
+    return normalize_rows(corpus[picks] + jitter).astype(np.float32)
+
+
+def ground_truth(corpus: np.ndarray, queries: np.ndarray, k: int,
+                 block_queries: int = 256, block_rows: int = 65536) -> np.ndarray:
+    """
+    Exact top-k row ids per query. Scores are computed tile by tile with a
+    running top-k, so memory stays bounded even for 10M-row corpora.
+    """
+    k = min(k, len(corpus))
+    out = np.empty((len(queries), k), dtype=np.int64)
+    for q_start in range(0, len(queries), block_queries):
+        q_block = queries[q_start:q_start + block_queries]
+        blocks = ((r, corpus[r:r + block_rows]) for r in range(0, len(corpus), block_rows))
+        out[q_start:q_start + len(q_block)] = running_top_k(blocks, q_block, k)[0]
+    return out
+
+
+def _parse_value(text: str):
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    return text
+
+
+def parse_backend(spec: str) -> tuple:
+    """'ivf:n_lists=256,nprobe=8' -> ('ivf', {'n_lists': 256, 'nprobe': 8})"""
+    name, _, params = spec.partition(":")
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown backend {name!r}; choose from {sorted(BACKENDS)}")
+    kwargs = {}
+    for item in filter(None, params.split(",")):
+        key, _, value = item.partition("=")
+        kwargs[key.strip()] = _parse_value(value.strip())
+    return name, kwargs
+
+
+def run_backend(spec: str, corpus: np.ndarray, queries: np.ndarray, truth: np.ndarray,
+                k: int) -> dict:
+    name, kwargs = parse_backend(spec)
+    index = BACKENDS[name](**kwargs)
+
+    start = time.perf_counter()
+    index.train(corpus)
+    index.add(corpus, 0)
+    build_s = time.perf_counter() - start
+    index_bytes = deep_sizeof(index)
+
+    latencies = np.empty(len(queries))
+    hits = 0
+    for i, q in enumerate(queries):
+        t0 = time.perf_counter()
+        rows, _ = index.search(corpus, q, k)
+        latencies[i] = time.perf_counter() - t0
+        hits += len(np.intersect1d(rows, truth[i], assume_unique=True))
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    return {
+        "backend": spec,
+        "n": len(corpus),
+        "dims": corpus.shape[1],
+        "build_s": round(build_s, 3),
+        "index_mb": round(index_bytes / 2**20, 2),
+        "qps": round(len(queries) / latencies.sum(), 1),
+        "p50_ms": round(p50, 3),
+        "p95_ms": round(p95, 3),
+        "p99_ms": round(p99, 3),
+        f"recall@{k}": round(hits / truth.size, 4),
+    }
+
+
+def print_table(rows: list):
+    if not rows:
+        return
+    columns = list(rows[0])
+    widths = [max(len(c), *(len(str(r[c])) for r in rows)) for c in columns]
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    for r in rows:
+        print("  ".join(str(r[c]).ljust(w) for c, w in zip(columns, widths)))
+
+
+def main(argv=None) -> list:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--sizes", default="10000", help="comma-separated corpus sizes")
+    parser.add_argument("--dims", type=int, default=64)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--noise", type=float, default=0.5)
+    parser.add_argument("--backends", nargs="+",
+                        default=["flat", "ivf:n_lists=64,nprobe=8", "sq8:rerank=100",
+                                 "pq:m=8,rerank=200"])
+    parser.add_argument("--json", help="also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    results = []
+    for n in (int(s) for s in args.sizes.split(",")):
+        start = time.perf_counter()
+        corpus = make_corpus(n, args.dims)
+        queries = make_queries(corpus, args.queries, args.noise)
+        truth = ground_truth(corpus, queries, args.k)
+        print(f"\nCorpus {n:,} x {args.dims} ({corpus.nbytes / 2**20:.1f} MB) "
+              f"generated in {time.perf_counter() - start:.2f}s")
+        rows = [run_backend(spec, corpus, queries, truth, args.k) for spec in args.backends]
+        print_table(rows)
+        results.extend(rows)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
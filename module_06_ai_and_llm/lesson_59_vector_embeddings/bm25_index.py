@@ -0,0 +1,93 @@
+"""
+Lesson 59: Vector Embeddings — BM25 Keyword Index
+
+Dense embeddings are bad at exact tokens: product codes, error strings,
+version numbers. BM25 is the classic keyword-relevance score:
+
+    score(d, q) = sum over query terms t of
+        idf(t) * tf(t, d) * (k1 + 1) / (tf(t, d) + k1 * (1 - b + b * len(d) / avg_len))
+
+Postings are kept per term as two compact arrays (row ids, term counts), so
+scoring a query is a handful of vectorized array operations per query term.
+"""
+
+import math
+import re
+
+import numpy as np
+from vector_math import top_k_indices
+
+TOKEN_RE = re.compile(r"\w+(?:[-.]\w+)*")   # keeps "gpt-4o", "v1.2.3", "ERR_CONN_RESET"
+
+
+def tokenize(text: str) -> list:
+    return TOKEN_RE.findall(text.lower())
+
+
+class BM25Index:
+    """Inverted index of term -> (row ids, term frequencies) with BM25 scoring."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._rows = {}        # term -> list of row ids
+        self._tfs = {}         # term -> list of term counts
+        self._arrays = {}      # term -> (np rows, np tfs) cache, dropped on append
+        self._doc_len = np.zeros(1024, dtype=np.float32)
+        self._size = 0
+        self._total_len = 0
+
+    def add(self, row: int, text: str):
+        """Index `text` as row `row`; rows must be added in increasing order."""
+        tokens = tokenize(text)
+        if row >= len(self._doc_len):
+            grown = np.zeros(max(row + 1, 2 * len(self._doc_len)), dtype=np.float32)
+            grown[:len(self._doc_len)] = self._doc_len
+            self._doc_len = grown
+        self._doc_len[row] = len(tokens)
+        self._total_len += len(tokens)
+        self._size = max(self._size, row + 1)
+        counts = {}
+        for tok in tokens:
+            counts[tok] = counts.get(tok, 0) + 1
+        for term, tf in counts.items():
+            self._rows.setdefault(term, []).append(row)
+            self._tfs.setdefault(term, []).append(tf)
+            self._arrays.pop(term, None)
+
+    def _postings(self, term: str) -> tuple:
+        if term not in self._arrays:
+            self._arrays[term] = (np.array(self._rows[term], dtype=np.int64),
+                                  np.array(self._tfs[term], dtype=np.float32))
+        return self._arrays[term]
+
+    def scores(self, query: str, rows: np.ndarray = None) -> np.ndarray:
+        """Dense BM25 score per row (0 for rows sharing no term with the query)."""
+        out = np.zeros(self._size, dtype=np.float32)
+        if self._size == 0:
+            return out
+        avg_len = self._total_len / self._size or 1.0
+        doc_len = self._doc_len[:self._size]
+        for term in set(tokenize(query)):
+            if term not in self._rows:
+                continue
+            term_rows, tf = self._postings(term)
+            df = len(term_rows)
+            idf = math.log(1 + (self._size - df + 0.5) / (df + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * doc_len[term_rows] / avg_len)
+            out[term_rows] += idf * tf * (self.k1 + 1) / (tf + norm)
+        if rows is not None:
+            mask = np.zeros(self._size, dtype=bool)
+            mask[rows] = True
+            out[~mask] = 0
+        return out
+
+    def search(self, query: str, top_k: int = 10, rows: np.ndarray = None) -> tuple:
+        """Return (rows, scores) of the best keyword matches, optionally within `rows`."""
+        scores = self.scores(query, rows)
+        matched = np.flatnonzero(scores)
+        best = top_k_indices(scores[matched], top_k)
+        return matched[best], scores[matched[best]]
+
+    def __len__(self):
+        return self._size
@@ -0,0 +1,154 @@
+"""
+Lesson 59: Vector Embeddings — Streaming Chunker
+
+chunk_text() needs the whole document in memory, split into a word list and
+re-joined. iter_chunks() instead reads the source a block at a time and keeps
+only the current window, so memory stays flat no matter how big the input is.
+
+Each Chunk carries [start, end) offsets back into the source:
+- str / text-file sources  -> character offsets
+- bytes / mmap / binary-file sources -> byte offsets (seek() straight to them)
+
+Window units:
+    "word"      whitespace-separated words (same windows as chunk_text)
+    "token"     runs of word characters or of punctuation (a rough LLM-token proxy)
+    "sentence"  text up to and including . ! or ? (capped at max_sentence_chars)
+
+Words, tokens and the closing .!? run of a sentence are capped at
+max_unit_chars: a megabyte of minified JSON or base64 becomes many units
+instead of one that is carried (and rescanned) from block to block.
+
+Chunk text is the exact source slice, original whitespace included, except
+that the text between two units is kept to its first max_gap_chars: a
+megabyte of blank lines is not worth embedding, and [start, end) still points
+at the full slice in the source.
+"""
+
+import mmap
+import re
+from collections import deque
+from itertools import islice
+from pathlib import Path
+from typing import NamedTuple
+
+READ_SIZE = 1 << 20
+
+
+class Chunk(NamedTuple):
+    text: str
+    start: int
+    end: int
+
+
+def _unit_pattern(unit: str, as_bytes: bool, max_sentence_chars: int,
+                  max_unit_chars: int) -> re.Pattern:
+    patterns = {
+        "word": r"\S{1,%d}" % max_unit_chars,
+        "token": r"\w{1,%d}|[^\w\s]{1,%d}" % (max_unit_chars, max_unit_chars),
+        "sentence": r"[^\s.!?][^.!?]{0,%d}[.!?]{0,%d}" % (max_sentence_chars, max_unit_chars),
+    }
+    if unit not in patterns:
+        raise ValueError(f"unit must be one of {sorted(patterns)}, got {unit!r}")
+    pattern = patterns[unit]
+    return re.compile(pattern.encode() if as_bytes else pattern)
+
+
+def _reader(source, read_size: int):
+    """Return (read(n) function, as_bytes) for any supported source."""
+    if isinstance(source, str):
+        pos = 0
+
+        def read_str(n):
+            nonlocal pos
+            piece = source[pos:pos + n]
+            pos += len(piece)
+            return piece
+        return read_str, False
+    if isinstance(source, (bytes, bytearray, memoryview, mmap.mmap)):
+        view = memoryview(source)   # slicing a view of an mmap does not copy the file
+        pos = 0
+
+        def read_buffer(n):
+            nonlocal pos
+            piece = bytes(view[pos:pos + n])
+            pos += len(piece)
+            return piece
+        return read_buffer, True
+    if hasattr(source, "read"):
+        first = source.read(read_size)
+        as_bytes = isinstance(first, bytes)
+        pending = [first]
+
+        def read_file(n):
+            return pending.pop() if pending else source.read(n)
+        return read_file, as_bytes
+    raise TypeError(f"Unsupported source type: {type(source).__name__}")
+
+
+def _iter_units(read, pattern: re.Pattern, read_size: int, empty, max_gap: int):
+    """
+    Yield (start, end, gap_before, text) for every unit match in the stream.
+    A match touching the end of the buffer might continue in the next block,
+    so it is carried over. The gap before it is carried separately, cut to
+    max_gap: a long run of unmatched text never stays in the buffer.
+    """
+    buf = empty
+    base = 0          # source offset of buf[0]
+    gap = empty       # text between the last unit and buf[0], at most max_gap long
+    eof = False
+    while not eof:
+        piece = read(read_size)
+        eof = not piece
+        buf += piece
+        consumed = 0      # buf index just past the last yielded unit
+        carry = len(buf)  # buf index of a match that may continue in the next block
+        for m in pattern.finditer(buf):
+            if not eof and m.end() == len(buf):
+                carry = m.start()
+                break
+            gap += buf[consumed:min(m.start(), consumed + max_gap - len(gap))]
+            yield base + m.start(), base + m.end(), gap, m.group()
+            gap = empty
+            consumed = m.end()
+        gap += buf[consumed:min(carry, consumed + max_gap - len(gap))]
+        buf = buf[carry:]
+        base += carry
+
+
+def iter_chunks(source, size: int = 100, overlap: int = 20, unit: str = "word",
+                read_size: int = READ_SIZE, encoding: str = "utf-8",
+                max_sentence_chars: int = 10_000, max_unit_chars: int = 1_000,
+                max_gap_chars: int = 1_000):
+    """Yield Chunk(text, start, end) windows of `size` units, `overlap` units shared."""
+    if not 0 <= overlap < size:
+        raise ValueError("overlap must be >= 0 and smaller than size")
+    read, as_bytes = _reader(source, read_size)
+    pattern = _unit_pattern(unit, as_bytes, max_sentence_chars, max_unit_chars)
+    join = b"".join if as_bytes else "".join
+
+    def make_chunk(window):
+        first = window[0]
+        raw = join([first[3]] + [gap + text for _, _, gap, text in islice(window, 1, None)])
+        text = raw.decode(encoding, errors="replace") if as_bytes else raw
+        return Chunk(text, first[0], window[-1][1])
+
+    window = deque()
+    emitted = False
+    empty = b"" if as_bytes else ""
+    for item in _iter_units(read, pattern, read_size, empty, max_gap_chars):
+        window.append(item)
+        if len(window) == size:
+            yield make_chunk(window)
+            emitted = True
+            for _ in range(size - overlap):
+                window.popleft()
+    if window and (not emitted or len(window) > overlap):
+        yield make_chunk(window)
+
+
+def iter_file_chunks(path, size: int = 100, overlap: int = 20, unit: str = "word",
+                     binary: bool = True, encoding: str = "utf-8", **kwargs):
+    """iter_chunks() over a file; binary=True gives byte offsets usable with seek()."""
+    mode = "rb" if binary else "r"
+    with open(Path(path), mode, **({} if binary else {"encoding": encoding})) as f:
+        yield from iter_chunks(f, size, overlap, unit, encoding=encoding, **kwargs)
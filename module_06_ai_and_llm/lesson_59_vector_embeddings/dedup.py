@@ -0,0 +1,93 @@
+"""
+Lesson 59: Vector Embeddings — Near-Duplicate Detection (MinHash LSH)
+
+Boilerplate footers and repeated paragraphs produce many almost identical
+chunks. Comparing every new chunk with every stored one is O(N); MinHash +
+locality-sensitive hashing finds likely duplicates in (roughly) constant time:
+
+1. Turn the text into a set of word shingles (overlapping word n-grams)
+2. MinHash: for each of num_perm random hash functions keep the minimum hash
+   over the set. Two signatures agree in a position with probability equal
+   to the Jaccard similarity of the two shingle sets
+3. LSH: cut the signature into bands; texts sharing any identical band land
+   in the same bucket and become candidates
+4. Candidates are confirmed by the estimated Jaccard similarity >= threshold
+
+No embedding call is needed, so duplicates are rejected before paying for one.
+"""
+
+import zlib
+
+import numpy as np
+
+_PRIME = np.uint64(4294967311)   # smallest prime above 2**32
+
+
+def shingles(text: str, size: int = 3) -> set:
+    """Set of lower-cased word n-grams (the whole text if it is shorter than `size`)."""
+    words = text.lower().split()
+    if len(words) <= size:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class MinHashLSH:
+    """MinHash signatures indexed by LSH bands, keyed by document id."""
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 128, bands: int = 32,
+                 shingle_size: int = 3, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        # a < 2**31 keeps a * x + b (x < 2**32) inside uint64 without overflow
+        self._a = rng.integers(1, 2**31, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 2**31, size=num_perm, dtype=np.uint64)
+        self._buckets = [{} for _ in range(bands)]   # band -> {band bytes: set of ids}
+        self._signatures = {}                        # id -> signature
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) for s in shingles(text, self.shingle_size)),
+            dtype=np.uint64,
+        )
+        return ((np.outer(hashes, self._a) + self._b) % _PRIME).min(axis=0)
+
+    def _band_keys(self, sig: np.ndarray) -> list:
+        return [sig[i * self.rows_per_band:(i + 1) * self.rows_per_band].tobytes()
+                for i in range(self.bands)]
+
+    def find(self, sig: np.ndarray):
+        """Return (doc_id, estimated_jaccard) of the best stored near-duplicate, or None."""
+        candidates = set()
+        for band, key in enumerate(self._band_keys(sig)):
+            candidates.update(self._buckets[band].get(key, ()))
+        best, best_sim = None, self.threshold
+        for doc_id in candidates:
+            sim = float(np.mean(self._signatures[doc_id] == sig))
+            if sim >= best_sim:
+                best, best_sim = doc_id, sim
+        return None if best is None else (best, best_sim)
+
+    def add(self, doc_id, sig: np.ndarray):
+        self._signatures[doc_id] = sig
+        for band, key in enumerate(self._band_keys(sig)):
+            self._buckets[band].setdefault(key, set()).add(doc_id)
+
+    def remove(self, doc_id):
+        sig = self._signatures.pop(doc_id, None)
+        if sig is None:
+            return
+        for band, key in enumerate(self._band_keys(sig)):
+            bucket = self._buckets[band].get(key)
+            if bucket is not None:
+                bucket.discard(doc_id)
+                if not bucket:
+                    del self._buckets[band][key]
+
+    def __len__(self):
+        return len(self._signatures)
@@ -0,0 +1,160 @@
+"""
+Lesson 59: Vector Embeddings — Embedding Cache
+
+Real embedding calls cost money and ~100ms each, and the same strings get
+embedded over and over (documents on every search, repeated queries).
+CachedEmbedder wraps any `embed(text) -> list[float]` function with:
+
+- a bounded in-memory LRU tier (OrderedDict)
+- an optional persistent SQLite tier that survives restarts
+- hit/miss counters
+- embed_many(), which only sends the misses to the backend, in one batch
+
+Keys are a SHA-256 of the model name plus the normalized text, so switching
+models never returns stale vectors. Vectors are stored as float32.
+
+Usage:
+    get_embedding = CachedEmbedder(fake_embedding, model="fake-64", db_path="emb.sqlite")
+"""
+
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def normalize_text(text: str) -> str:
+    """Collapse runs of whitespace so trivially different strings share a cache entry."""
+    return " ".join(text.split())
+
+
+class CachedEmbedder:
+    """Two-tier (memory LRU + SQLite) cache in front of an embedding function."""
+
+    def __init__(self, embed_fn, model: str = "default", max_memory_items: int = 10_000,
+                 db_path: str = None, batch_fn=None, normalize=normalize_text):
+        self.embed_fn = embed_fn
+        self.batch_fn = batch_fn          # optional: list[str] -> list of vectors, one API call
+        self.model = model
+        self.max_memory_items = max_memory_items
+        self.normalize = normalize
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._db = None
+        if db_path is not None:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " key TEXT PRIMARY KEY, model TEXT NOT NULL, dims INTEGER NOT NULL,"
+                " vector BLOB NOT NULL)"
+            )
+            self._db.commit()
+
+    def key(self, text: str) -> str:
+        payload = f"{self.model}\x00{self.normalize(text)}".encode("utf-8")
+        return hashlib.sha256(payload).hexdigest()
+
+    # -- tiers ---------------------------------------------------------
+
+    def _memory_get(self, key: str):
+        vec = self._memory.get(key)
+        if vec is not None:
+            self._memory.move_to_end(key)
+        return vec
+
+    def _memory_put(self, key: str, vec: np.ndarray):
+        self._memory[key] = vec
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def _disk_get_many(self, keys: list) -> dict:
+        if self._db is None or not keys:
+            return {}
+        found = {}
+        for start in range(0, len(keys), 500):   # stay under SQLite's parameter limit
+            chunk = keys[start:start + 500]
+            rows = self._db.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})",
+                chunk,
+            ).fetchall()
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def _disk_put_many(self, items: dict):
+        if self._db is None or not items:
+            return
+        self._db.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, model, dims, vector) VALUES (?, ?, ?, ?)",
+            [(k, self.model, len(v), v.tobytes()) for k, v in items.items()],
+        )
+        self._db.commit()
+
+    # -- public API ----------------------------------------------------
+
+    def embed_many(self, texts: list) -> np.ndarray:
+        """Embed a batch of texts as an (n, dims) float32 array; only misses hit the backend."""
+        keys = [self.key(t) for t in texts]
+        vectors = {}
+        with self._lock:
+            for k in keys:
+                if k not in vectors:
+                    vec = self._memory_get(k)
+                    if vec is not None:
+                        vectors[k] = vec
+            self.memory_hits += sum(1 for k in keys if k in vectors)
+
+            pending = list(dict.fromkeys(k for k in keys if k not in vectors))
+            from_disk = self._disk_get_many(pending)
+            for k, vec in from_disk.items():
+                self._memory_put(k, vec)
+            vectors.update(from_disk)
+            self.disk_hits += sum(1 for k in keys if k in from_disk)
+
+        missing = {}
+        for text, k in zip(texts, keys):
+            if k not in vectors and k not in missing:
+                missing[k] = text
+        if missing:
+            miss_texts = list(missing.values())
+            if self.batch_fn is not None:
+                computed = self.batch_fn(miss_texts)
+            else:
+                computed = [self.embed_fn(t) for t in miss_texts]
+            fresh = {k: np.asarray(v, dtype=np.float32) for k, v in zip(missing, computed)}
+            with self._lock:
+                self.misses += sum(1 for k in keys if k in fresh)
+                for k, vec in fresh.items():
+                    self._memory_put(k, vec)
+                self._disk_put_many(fresh)
+            vectors.update(fresh)
+
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack([vectors[k] for k in keys])
+
+    def __call__(self, text: str) -> list:
+        """Drop-in replacement for get_embedding(text)."""
+        return self.embed_many([text])[0].tolist()
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            "memory_items": len(self._memory),
+        }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,58 @@
+"""
+Lesson 59: Vector Embeddings — Fast Deterministic Fake Embeddings
+
+embed_many(texts, dims) turns any number of texts into an (n, dims) float32
+array of unit vectors without touching NumPy's global random state:
+
+1. Each text is hashed (MD5 of the lower-cased, stripped text) to a 64-bit seed
+2. A counter-based generator (SplitMix64) expands every seed into random bits,
+   vectorized across the whole batch
+3. Box-Muller turns the bits into normal samples, which are normalized
+
+No shared state means it is safe to call from many threads at once, and the
+same text always gets the same vector in any process.
+"""
+
+import hashlib
+
+import numpy as np
+
+BATCH_ROWS = 16384   # texts expanded per block, bounds temporary memory
+
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+_MIX1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX2 = np.uint64(0x94D049BB133111EB)
+
+
+def text_seed(text: str) -> int:
+    return int(hashlib.md5(text.lower().strip().encode()).hexdigest()[:16], 16)
+
+
+def _splitmix64(state: np.ndarray) -> np.ndarray:
+    z = state
+    z = (z ^ (z >> np.uint64(30))) * _MIX1
+    z = (z ^ (z >> np.uint64(27))) * _MIX2
+    return z ^ (z >> np.uint64(31))
+
+
+def _normals_from_seeds(seeds: np.ndarray, dims: int) -> np.ndarray:
+    half = (dims + 1) // 2
+    # k-th SplitMix64 output for seed s is mix(s + (k + 1) * golden); uint64 wraps on overflow
+    steps = np.arange(1, 2 * half + 1, dtype=np.uint64) * _GOLDEN
+    bits = _splitmix64(seeds[:, None] + steps[None, :])
+    uniform = (bits >> np.uint64(11)).astype(np.float64) * (1.0 / (1 << 53))
+    u1, u2 = 1.0 - uniform[:, :half], uniform[:, half:]   # u1 in (0, 1], safe for log
+    radius = np.sqrt(-2.0 * np.log(u1))
+    angle = 2.0 * np.pi * u2
+    return np.concatenate([radius * np.cos(angle), radius * np.sin(angle)], axis=1)[:, :dims]
+
+
+def embed_many(texts: list, dims: int = 64) -> np.ndarray:
+    """Deterministic unit-length fake embeddings for a batch of texts, shape (n, dims)."""
+    seeds = np.fromiter((text_seed(t) for t in texts), dtype=np.uint64, count=len(texts))
+    out = np.empty((len(seeds), dims), dtype=np.float32)
+    for start in range(0, len(seeds), BATCH_ROWS):
+        vecs = _normals_from_seeds(seeds[start:start + BATCH_ROWS], dims)
+        vecs /= np.linalg.norm(vecs, axis=1, keepdims=True)
+        out[start:start + BATCH_ROWS] = vecs
+    return out
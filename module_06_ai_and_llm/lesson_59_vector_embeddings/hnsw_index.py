@@ -0,0 +1,147 @@
+"""
+Lesson 59: Vector Embeddings — HNSW Graph Index
+
+Hierarchical Navigable Small World graphs (Malkov & Yashunin, 2016):
+- Every vector is a node; each node links to its M most useful neighbours
+- Nodes are randomly promoted to sparse upper layers (like a skip list)
+- A search greedily walks the top layer, then drops down a layer at a time,
+  keeping a beam of `ef_search` candidates on the dense bottom layer
+
+Unlike IVF there is nothing to retrain: add() links new nodes into the
+existing graph, so the index keeps up with continuous ingest.
+
+Follows the lesson 59 index protocol (train / add / search); node ids are
+the row numbers of the vector matrix passed in.
+"""
+
+import heapq
+import math
+
+import numpy as np
+
+
+class HNSWIndex:
+    """Approximate nearest-neighbour graph over normalized vectors (cosine similarity)."""
+
+    def __init__(self, M: int = 16, ef_construction: int = 100, ef_search: int = 50,
+                 seed: int = 0):
+        self.M = M                      # links per node on upper layers
+        self.M0 = 2 * M                 # links per node on layer 0
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self._level_mult = 1 / math.log(M)
+        self._rng = np.random.default_rng(seed)
+        self._neighbors = []            # _neighbors[node][level] -> list of node ids
+        self._entry_point = None
+        self._max_level = -1
+
+    def train(self, vectors: np.ndarray):
+        """Nothing to learn: just start an empty graph, which add() then grows."""
+        self._neighbors = []
+        self._entry_point = None
+        self._max_level = -1
+
+    def add(self, vectors: np.ndarray, start: int = 0):
+        for node in range(start, len(vectors)):
+            self._insert(vectors, node)
+
+    def _random_level(self) -> int:
+        return int(-math.log(1.0 - self._rng.random()) * self._level_mult)
+
+    def _insert(self, vectors: np.ndarray, node: int):
+        if node != len(self._neighbors):
+            raise ValueError(f"Rows must be added in order: expected {len(self._neighbors)}, got {node}")
+        level = self._random_level()
+        self._neighbors.append([[] for _ in range(level + 1)])
+        if self._entry_point is None:
+            self._entry_point, self._max_level = node, level
+            return
+
+        query = vectors[node]
+        entry = [self._entry_point]
+        for lc in range(self._max_level, level, -1):
+            entry = [self._search_layer(vectors, query, entry, 1, lc)[0][1]]
+
+        for lc in range(min(level, self._max_level), -1, -1):
+            found = self._search_layer(vectors, query, entry, self.ef_construction, lc)
+            max_links = self.M0 if lc == 0 else self.M
+            links = self._select_neighbors(vectors, found, self.M)
+            self._neighbors[node][lc] = links
+            for other in links:
+                other_links = self._neighbors[other][lc]
+                other_links.append(node)
+                if len(other_links) > max_links:
+                    sims = vectors[other_links] @ vectors[other]
+                    ranked = sorted(zip(sims.tolist(), other_links), reverse=True)
+                    self._neighbors[other][lc] = self._select_neighbors(vectors, ranked, max_links)
+            entry = [n for _, n in found]
+
+        if level > self._max_level:
+            self._entry_point, self._max_level = node, level
+
+    def _select_neighbors(self, vectors: np.ndarray, ranked: list, m: int) -> list:
+        """
+        Diversity heuristic: keep a candidate only if it is closer to the base
+        node than to any neighbour already kept. Falls back to the nearest
+        remaining candidates so every node still gets up to m links.
+        `ranked` is a list of (similarity, node) sorted best first.
+        """
+        if len(ranked) <= m:
+            return [n for _, n in ranked]
+        cands = [n for _, n in ranked]
+        pairwise = vectors[cands] @ vectors[cands].T
+        selected, skipped = [], []
+        for i, (sim, _) in enumerate(ranked):
+            if len(selected) >= m:
+                break
+            if selected and pairwise[i, selected].max() > sim:
+                skipped.append(i)
+            else:
+                selected.append(i)
+        selected += skipped[:m - len(selected)]
+        return [cands[i] for i in selected]
+
+    def _search_layer(self, vectors: np.ndarray, query: np.ndarray, entry: list,
+                      ef: int, level: int) -> list:
+        """Beam search on one layer. Returns up to ef (similarity, node) pairs, best first."""
+        visited = set(entry)
+        entry_sims = (vectors[entry] @ query).tolist()
+        candidates = [(-s, n) for s, n in zip(entry_sims, entry)]   # max-heap on similarity
+        results = [(s, n) for s, n in zip(entry_sims, entry)]       # min-heap, worst on top
+        heapq.heapify(candidates)
+        heapq.heapify(results)
+        while len(results) > ef:
+            heapq.heappop(results)
+
+        while candidates:
+            neg_sim, current = heapq.heappop(candidates)
+            if -neg_sim < results[0][0] and len(results) >= ef:
+                break
+            fresh = [n for n in self._neighbors[current][level] if n not in visited]
+            if not fresh:
+                continue
+            visited.update(fresh)
+            for sim, n in zip((vectors[fresh] @ query).tolist(), fresh):
+                if len(results) < ef or sim > results[0][0]:
+                    heapq.heappush(candidates, (-sim, n))
+                    heapq.heappush(results, (sim, n))
+                    if len(results) > ef:
+                        heapq.heappop(results)
+        return sorted(results, reverse=True)
+
+    def search(self, vectors: np.ndarray, query: np.ndarray, top_k: int = 5,
+               ef_search: int = None) -> tuple:
+        """Return (rows, scores) of the approximate top_k neighbours of `query`."""
+        if self._entry_point is None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        entry = [self._entry_point]
+        for lc in range(self._max_level, 0, -1):
+            entry = [self._search_layer(vectors, query, entry, 1, lc)[0][1]]
+        ef = max(ef_search or self.ef_search, top_k)
+        found = self._search_layer(vectors, query, entry, ef, 0)[:top_k]
+        rows = np.array([n for _, n in found], dtype=np.int64)
+        scores = np.array([s for s, _ in found], dtype=np.float32)
+        return rows, scores
+
+    def __len__(self):
+        return len(self._neighbors)
@@ -0,0 +1,158 @@
+"""
+Lesson 59: Vector Embeddings — Async Ingestion Pipeline
+
+With a network embedding API, indexing one text at a time means one ~100ms
+round trip per chunk: hours for a large corpus. IngestPipeline overlaps the
+work in asyncio stages connected by bounded queues:
+
+    reader -> chunker -> batcher -> embedders (x concurrency) -> writer
+
+- batcher: emits a batch when it holds batch_size chunks OR max_wait seconds
+  after its first chunk arrived, so a slow trickle of input is not stuck
+- embedders: `concurrency` workers, each calling the backend with retries
+  (exponential backoff with jitter) on network-type errors
+- writer: a single task, so the vector store is only touched by one writer
+- backpressure: every queue is bounded, so a slow backend pauses the reader
+  instead of buffering the whole corpus in memory
+
+Batches may finish out of order when concurrency > 1.
+
+Usage:
+    pipeline = IngestPipeline(embed_many, write=db.add_many, batch_size=64)
+    stats = asyncio.run(pipeline.run(documents))
+"""
+
+import asyncio
+import inspect
+import random
+import time
+
+from chunking import iter_chunks
+
+_DONE = object()   # end-of-stream marker passed down the queues
+
+
+class IngestPipeline:
+    """Chunk, batch, embed and store documents with bounded concurrency and retries."""
+
+    def __init__(self, embed_batch, write, chunk_size: int = 100, overlap: int = 20,
+                 batch_size: int = 64, max_wait: float = 0.05, concurrency: int = 4,
+                 max_retries: int = 3, backoff: float = 0.5, retry_on: tuple = (OSError,),
+                 queue_size: int = None):
+        self.embed_batch = embed_batch   # list[str] -> vectors; plain or async function
+        self.write = write               # (texts, metadatas, vectors) -> anything
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.retry_on = retry_on         # OSError covers ConnectionError and TimeoutError
+        self.queue_size = queue_size or 2 * concurrency
+        self._stats = {}
+
+    async def run(self, documents) -> dict:
+        """
+        Ingest `documents`: an iterable or async iterable of texts or
+        (text, metadata) pairs. Returns counts, retries and elapsed seconds.
+        """
+        self._stats = {"documents": 0, "chunks": 0, "batches": 0, "retries": 0}
+        docs = asyncio.Queue(self.queue_size)
+        chunks = asyncio.Queue(self.queue_size * self.batch_size)
+        batches = asyncio.Queue(self.queue_size)
+        embedded = asyncio.Queue(self.queue_size)
+        start = time.perf_counter()
+        tasks = [
+            asyncio.create_task(self._read(documents, docs)),
+            asyncio.create_task(self._chunk(docs, chunks)),
+            asyncio.create_task(self._batch(chunks, batches)),
+            *(asyncio.create_task(self._embed(batches, embedded))
+              for _ in range(self.concurrency)),
+            asyncio.create_task(self._write(embedded)),
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:   # one stage failed: stop the others instead of hanging
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        return {**self._stats, "seconds": round(time.perf_counter() - start, 3)}
+
+    async def _read(self, documents, out: asyncio.Queue):
+        if hasattr(documents, "__aiter__"):
+            async for doc in documents:
+                await out.put(doc)
+        else:
+            for doc in documents:
+                await out.put(doc)
+        await out.put(_DONE)
+
+    async def _chunk(self, docs: asyncio.Queue, out: asyncio.Queue):
+        while (doc := await docs.get()) is not _DONE:
+            text, metadata = (doc, {}) if isinstance(doc, str) else doc
+            self._stats["documents"] += 1
+            for chunk in iter_chunks(text, self.chunk_size, self.overlap):
+                meta = {**(metadata or {}), "chunk_start": chunk.start, "chunk_end": chunk.end}
+                await out.put((chunk.text, meta))
+        await out.put(_DONE)
+
+    async def _batch(self, chunks: asyncio.Queue, out: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        batch, deadline = [], None
+        while True:
+            try:
+                # asyncio.timeout, not wait_for: on 3.11 wait_for can turn an outer
+                # cancel() into TimeoutError, leaving this task blocked on a full queue
+                async with asyncio.timeout_at(deadline if batch else None):
+                    item = await chunks.get()
+            except TimeoutError:
+                await out.put(batch)
+                batch = []
+                continue
+            if item is _DONE:
+                break
+            if not batch:
+                deadline = loop.time() + self.max_wait
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                await out.put(batch)
+                batch = []
+        if batch:
+            await out.put(batch)
+        for _ in range(self.concurrency):
+            await out.put(_DONE)
+
+    async def _call_backend(self, texts: list):
+        if inspect.iscoroutinefunction(self.embed_batch):
+            return await self.embed_batch(texts)
+        return await asyncio.to_thread(self.embed_batch, texts)   # keep the loop responsive
+
+    async def _embed_with_retry(self, texts: list):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await self._call_backend(texts)
+            except self.retry_on:
+                if attempt == self.max_retries:
+                    raise
+                self._stats["retries"] += 1
+                await asyncio.sleep(self.backoff * 2 ** attempt * (0.5 + random.random()))
+
+    async def _embed(self, batches: asyncio.Queue, out: asyncio.Queue):
+        while (batch := await batches.get()) is not _DONE:
+            texts = [text for text, _ in batch]
+            vectors = await self._embed_with_retry(texts)
+            await out.put((texts, [meta for _, meta in batch], vectors))
+        await out.put(_DONE)
+
+    async def _write(self, embedded: asyncio.Queue):
+        finished = 0
+        while finished < self.concurrency:
+            item = await embedded.get()
+            if item is _DONE:
+                finished += 1
+                continue
+            texts, metadatas, vectors = item
+            self.write(texts, metadatas, vectors)
+            self._stats["chunks"] += len(texts)
+            self._stats["batches"] += 1
@@ -0,0 +1,113 @@
+"""
+Lesson 59: Vector Embeddings — IVF (Inverted File) Index
+
+Approximate nearest-neighbour search for normalized embeddings:
+1. Train k-means centroids ("coarse quantizer") on a sample of the vectors
+2. File every vector under its closest centroid (a posting list)
+3. At query time, only scan the posting lists of the `nprobe` closest centroids
+
+Higher nprobe = better recall, slower queries. nprobe == n_lists is exact search.
+
+Index protocol shared with the other lesson 59 indexes:
+    train(vectors)              learn parameters from the stored vectors
+    add(vectors, start)         index rows vectors[start:]
+    search(vectors, query, top_k, ...) -> (rows, scores)
+"""
+
+import numpy as np
+from vector_math import normalize_rows, top_k_indices
+
+
+def assign(vectors: np.ndarray, centroids: np.ndarray, block: int = 65536) -> np.ndarray:
+    """Index of the most similar centroid for each row, computed in blocks."""
+    out = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), block):
+        out[start:start + block] = np.argmax(vectors[start:start + block] @ centroids.T, axis=1)
+    return out
+
+
+def spherical_kmeans(vectors: np.ndarray, k: int, n_iter: int = 20, seed: int = 0) -> np.ndarray:
+    """
+    K-means on the unit sphere (cosine similarity instead of L2 distance).
+    Returns a (k, dims) float32 array of normalized centroids.
+    """
+    rng = np.random.default_rng(seed)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    k = min(k, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+
+    for _ in range(n_iter):
+        labels = assign(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        counts = np.bincount(labels, minlength=k)
+
+        # Re-seed empty clusters with random points so no centroid is wasted
+        empty = np.flatnonzero(counts == 0)
+        if len(empty):
+            sums[empty] = vectors[rng.choice(len(vectors), size=len(empty), replace=False)]
+
+        centroids = normalize_rows(sums).astype(np.float32)
+    return centroids
+
+
+class IVFIndex:
+    """Coarse-quantizer index with per-centroid posting lists of row ids."""
+
+    def __init__(self, n_lists: int = 100, nprobe: int = 8, n_iter: int = 20,
+                 max_train_points: int = 256, seed: int = 0):
+        self.n_lists = n_lists
+        self.nprobe = nprobe
+        self.n_iter = n_iter
+        self.max_train_points = max_train_points  # sample size per centroid
+        self.seed = seed
+        self.centroids = None
+        self._lists = []      # python lists of row ids, cheap to append to
+        self._arrays = []     # cached np.array per list, None when stale
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def train(self, vectors: np.ndarray):
+        if len(vectors) == 0:
+            raise ValueError("Cannot train an IVF index on zero vectors")
+        rng = np.random.default_rng(self.seed)
+        sample_size = min(len(vectors), self.n_lists * self.max_train_points)
+        sample = vectors[np.sort(rng.choice(len(vectors), size=sample_size, replace=False))]
+        self.centroids = spherical_kmeans(sample, self.n_lists, self.n_iter, self.seed)
+        self._lists = [[] for _ in range(len(self.centroids))]
+        self._arrays = [None] * len(self.centroids)
+
+    def add(self, vectors: np.ndarray, start: int = 0):
+        if not self.is_trained:
+            raise RuntimeError("IVFIndex.train() must be called before add()")
+        new = vectors[start:]
+        for offset, list_id in enumerate(assign(new, self.centroids).tolist()):
+            self._lists[list_id].append(start + offset)
+            self._arrays[list_id] = None
+
+    def _postings(self, list_id: int) -> np.ndarray:
+        if self._arrays[list_id] is None:
+            self._arrays[list_id] = np.array(self._lists[list_id], dtype=np.int64)
+        return self._arrays[list_id]
+
+    def search(self, vectors: np.ndarray, query: np.ndarray, top_k: int = 5,
+               nprobe: int = None) -> tuple:
+        """Return (rows, scores) of the best top_k candidates from the probed lists."""
+        if not self.is_trained:
+            raise RuntimeError("IVFIndex.train() must be called before search()")
+        probe = top_k_indices(self.centroids @ query, nprobe or self.nprobe)
+        candidates = np.concatenate([self._postings(c) for c in probe])
+        if len(candidates) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        scores = vectors[candidates] @ query
+        best = top_k_indices(scores, top_k)
+        return candidates[best], scores[best]
+
+    def list_sizes(self) -> np.ndarray:
+        """Number of vectors filed under each centroid (useful to spot imbalance)."""
+        return np.array([len(lst) for lst in self._lists], dtype=np.int64)
+
+    def __len__(self):
+        return sum(len(lst) for lst in self._lists)
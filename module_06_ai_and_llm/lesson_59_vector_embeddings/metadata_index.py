@@ -0,0 +1,87 @@
+"""
+Lesson 59: Vector Embeddings — Inverted Metadata Index
+
+Maps every (metadata key, value) pair to the sorted row ids that carry it,
+so a filter like where={"tenant": "acme", "lang": ["en", "de"]} resolves to
+a row-id array without touching the vectors:
+
+- a scalar value means equality
+- a list/tuple/set means "any of these"
+- several keys are AND-ed together
+
+List-valued metadata (e.g. {"tags": ["python", "numpy"]}) is indexed per element.
+Rows are normally added in increasing order, so posting lists stay sorted for
+free; a late add to an older row (merged metadata) is sorted lazily on read.
+"""
+
+import numpy as np
+
+
+class MetadataIndex:
+    """(key, value) -> sorted row ids, with cached NumPy arrays for fast set operations."""
+
+    def __init__(self):
+        self._postings = {}   # (key, value) -> list of row ids
+        self._arrays = {}     # (key, value) -> np.ndarray cache, dropped on append
+        self._unsorted = set()   # pairs that received an out-of-order row
+
+    @staticmethod
+    def _values(value) -> list:
+        if isinstance(value, (str, int, float)) or value is None:
+            return (value,)   # the common case, and always hashable
+        values = value if isinstance(value, (list, tuple, set, frozenset)) else [value]
+        out = []
+        for v in values:
+            try:
+                hash(v)
+            except TypeError:
+                continue   # nested dicts etc. are stored but not filterable
+            out.append(v)
+        return list(dict.fromkeys(out))   # a row is posted once per value: rows() needs unique ids
+
+    def add(self, row: int, metadata: dict):
+        for key, value in metadata.items():
+            for v in self._values(value):
+                pair = (key, v)
+                postings = self._postings.get(pair)
+                if postings is None:
+                    postings = self._postings[pair] = []
+                elif row < postings[-1]:
+                    self._unsorted.add(pair)
+                postings.append(row)
+                if self._arrays:
+                    self._arrays.pop(pair, None)
+
+    def _rows_for(self, key, value) -> np.ndarray:
+        pair = (key, value)
+        if pair not in self._postings:
+            return np.empty(0, dtype=np.int64)
+        if pair in self._unsorted:
+            self._postings[pair].sort()
+            self._unsorted.discard(pair)
+        if pair not in self._arrays:
+            self._arrays[pair] = np.array(self._postings[pair], dtype=np.int64)
+        return self._arrays[pair]
+
+    def rows(self, where: dict) -> np.ndarray:
+        """Sorted row ids matching every condition in `where`."""
+        result = None
+        # Evaluate the most selective condition first so intersections stay small
+        conditions = []
+        for key, wanted in where.items():
+            parts = [self._rows_for(key, v) for v in self._values(wanted)]
+            if len(parts) == 1:
+                rows = parts[0]
+            elif parts:
+                rows = np.unique(np.concatenate(parts))
+            else:
+                rows = np.empty(0, dtype=np.int64)
+            conditions.append(rows)
+        for rows in sorted(conditions, key=len):
+            result = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+            if len(result) == 0:
+                break
+        return result if result is not None else np.empty(0, dtype=np.int64)
+
+    def count(self, key, value) -> int:
+        return len(self._postings.get((key, value), ()))
@@ -0,0 +1,125 @@
+"""
+Lesson 59: Vector Embeddings — Out-of-Core Exact Search
+
+A 100 GB vector file does not fit in 16 GB of RAM, but exact search never
+needs all of it at once. DiskSearcher streams the saved vectors file:
+
+1. A background thread reads fixed-size blocks of rows into a small pool
+   of reusable buffers (readinto, no per-block allocation)
+2. The main thread scores each block with one matmul against all queries
+3. A running top-k per query (previous winners + this block, re-selected
+   with argpartition) is all that is kept between blocks
+
+While block i is being scored, block i+1 is already being read, so disk
+I/O and compute overlap. Memory is bounded by (prefetch + 1) blocks plus
+the running top-k, whatever the file size.
+
+Usage:
+    searcher = DiskSearcher("store_dir", block_rows=262_144)
+    rows, scores = searcher.search_vectors(query_vectors, top_k=10)
+"""
+
+import json
+import os
+import queue
+import threading
+from pathlib import Path
+
+import numpy as np
+from document_file import META_FILE, VECTORS_FILE, open_documents
+from vector_math import running_top_k
+
+
+def iter_blocks(path, dims: int, block_rows: int = 65536, prefetch: int = 2,
+                dtype=np.float32):
+    """
+    Yield (start_row, block) for consecutive blocks of a flat row-major file,
+    read ahead on a background thread. A yielded block is only valid until
+    the next one is requested: its buffer is then reused.
+    """
+    itemsize = np.dtype(dtype).itemsize
+    free = queue.Queue()
+    for _ in range(prefetch + 1):
+        free.put(np.empty((block_rows, dims), dtype=dtype))
+    full = queue.Queue()
+    stop = threading.Event()
+
+    def reader():
+        try:
+            with open(path, "rb", buffering=0) as f:
+                if hasattr(os, "posix_fadvise"):
+                    os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+                start = 0
+                while not stop.is_set():
+                    buf = free.get()
+                    if buf is None:
+                        break
+                    view = memoryview(buf).cast("B")
+                    n_bytes = 0
+                    while n_bytes < len(view):   # raw reads may return short counts
+                        got = f.readinto(view[n_bytes:])
+                        if not got:
+                            break
+                        n_bytes += got
+                    n_rows = n_bytes // (dims * itemsize)
+                    if n_rows == 0:
+                        break
+                    full.put((start, buf, n_rows))
+                    start += n_rows
+        except BaseException as exc:   # re-raised in the consuming thread
+            full.put(exc)
+        full.put(None)
+
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+    try:
+        while (item := full.get()) is not None:
+            if isinstance(item, BaseException):
+                raise item
+            start, buf, n_rows = item
+            yield start, buf[:n_rows]
+            free.put(buf)
+    finally:
+        stop.set()
+        free.put(None)   # wakes a reader waiting for a buffer
+        thread.join()
+
+
+def search_file(path, queries: np.ndarray, dims: int, top_k: int = 5,
+                block_rows: int = 65536, prefetch: int = 2) -> tuple:
+    """Exact top-k (rows, scores) per query row, best first, streaming `path` block by block."""
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    return running_top_k(iter_blocks(path, dims, block_rows, prefetch), queries, top_k)
+
+
+class DiskSearcher:
+    """
+    Exact search over a saved store without loading its vectors into memory.
+    Documents are decoded only for the rows a search returns.
+    """
+
+    def __init__(self, store_dir, block_rows: int = 65536, prefetch: int = 2):
+        self.store_dir = Path(store_dir)
+        self.block_rows = block_rows
+        self.prefetch = prefetch
+        with open(self.store_dir / META_FILE, encoding="utf-8") as f:
+            meta = json.load(f)
+        self.count, self.dims = meta["count"], meta["dims"]
+        self._documents = open_documents(self.store_dir)
+
+    def search_vectors(self, queries: np.ndarray, top_k: int = 5) -> tuple:
+        """(rows, scores) arrays of shape (n_queries, top_k) for normalized query vectors."""
+        if self.count == 0:
+            n = len(np.atleast_2d(queries))
+            return np.empty((n, 0), dtype=np.int64), np.empty((n, 0), dtype=np.float32)
+        return search_file(self.store_dir / VECTORS_FILE, queries, self.dims, top_k,
+                           self.block_rows, self.prefetch)
+
+    def search_many(self, query_vectors: np.ndarray, top_k: int = 5) -> list:
+        """Result dicts (id, text, metadata, score) for each query vector."""
+        rows, scores = self.search_vectors(query_vectors, top_k)
+        return [
+            [dict(zip(("id", "text", "metadata"), self._documents[r]), score=float(s))
+             for r, s in zip(row_list, score_list)]
+            for row_list, score_list in zip(rows.tolist(), scores.tolist())
+        ]
@@ -0,0 +1,201 @@
+"""
+Lesson 59: Vector Embeddings — Compressed Vectors (Quantization)
+
+Two ways to shrink embeddings so a much larger corpus fits in RAM:
+
+ScalarQuantizer   float32 -> 1 byte per dimension (4x smaller)
+ProductQuantizer  split the vector into m sub-vectors, replace each with the
+                  id of its nearest of 256 learned centroids (m bytes per vector;
+                  64 dims with m=8 is 32x smaller)
+
+QuantizedIndex scores every stored code cheaply, keeps the best `rerank`
+candidates, and re-scores only those against the full-precision vectors.
+Those vectors can be any row-indexable matrix, including an np.memmap: with
+the full-precision rows in a file, only the codes need to stay in memory
+(SimpleVectorDB(vectors_path=...) + build_index(QuantizedIndex(...))).
+
+Follows the lesson 59 index protocol (train / add / search).
+"""
+
+import numpy as np
+from vector_math import top_k_indices
+
+BLOCK_SIZE = 65536   # rows decoded at a time, bounds temporary memory
+
+
+def kmeans(vectors: np.ndarray, k: int, n_iter: int = 20, seed: int = 0) -> np.ndarray:
+    """Plain (L2) k-means. Returns a (k, dims) float32 centroid array."""
+    rng = np.random.default_rng(seed)
+    vectors = np.asarray(vectors, dtype=np.float32)
+    k = min(k, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+    for _ in range(n_iter):
+        labels = nearest_centroid(vectors, centroids)
+        counts = np.bincount(labels, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = vectors[rng.choice(len(vectors), size=len(empty), replace=False)]
+    return centroids
+
+
+def nearest_centroid(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    # ||x - c||^2 = ||x||^2 - 2 x.c + ||c||^2; ||x||^2 is the same for every c
+    out = np.empty(len(vectors), dtype=np.int64)
+    c_sq = (centroids ** 2).sum(axis=1)
+    for start in range(0, len(vectors), BLOCK_SIZE):
+        block = vectors[start:start + BLOCK_SIZE]
+        out[start:start + BLOCK_SIZE] = np.argmin(c_sq - 2 * block @ centroids.T, axis=1)
+    return out
+
+
+class ScalarQuantizer:
+    """Per-dimension min/max scaling to 8-bit codes."""
+
+    def __init__(self):
+        self.offset = None
+        self.scale = None
+
+    def train(self, vectors: np.ndarray):
+        lo = vectors.min(axis=0).astype(np.float32)
+        hi = vectors.max(axis=0).astype(np.float32)
+        self.offset = lo
+        self.scale = np.maximum(hi - lo, 1e-12) / 255.0
+
+    @property
+    def code_size(self) -> int:
+        return len(self.offset)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.rint((vectors - self.offset) / self.scale)
+        return np.clip(codes, 0, 255).astype(np.uint8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return codes.astype(np.float32) * self.scale + self.offset
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        # q . (code * scale + offset) = code . (q * scale) + q . offset
+        weighted = (query * self.scale).astype(np.float32)
+        bias = float(query @ self.offset)
+        out = np.empty(len(codes), dtype=np.float32)
+        for start in range(0, len(codes), BLOCK_SIZE):
+            block = codes[start:start + BLOCK_SIZE].astype(np.float32)
+            out[start:start + BLOCK_SIZE] = block @ weighted + bias
+        return out
+
+
+class ProductQuantizer:
+    """Split vectors into m sub-spaces, each encoded as one of ks centroid ids."""
+
+    def __init__(self, m: int = 8, ks: int = 256, n_iter: int = 20, seed: int = 0):
+        if ks > 256:
+            raise ValueError("ks must be <= 256 so codes fit in one byte")
+        self.m = m
+        self.ks = ks
+        self.n_iter = n_iter
+        self.seed = seed
+        self.codebooks = None   # (m, ks, dims // m)
+
+    def train(self, vectors: np.ndarray):
+        dims = vectors.shape[1]
+        if dims % self.m:
+            raise ValueError(f"dims ({dims}) must be divisible by m ({self.m})")
+        sub = dims // self.m
+        books = np.zeros((self.m, self.ks, sub), dtype=np.float32)
+        for j in range(self.m):
+            part = kmeans(vectors[:, j * sub:(j + 1) * sub], self.ks, self.n_iter, self.seed + j)
+            books[j, :len(part)] = part
+        self.codebooks = books
+
+    @property
+    def code_size(self) -> int:
+        return self.m
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        sub = self.codebooks.shape[2]
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            codes[:, j] = nearest_centroid(vectors[:, j * sub:(j + 1) * sub], self.codebooks[j])
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        parts = [self.codebooks[j][codes[:, j]] for j in range(self.m)]
+        return np.concatenate(parts, axis=1)
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        # Asymmetric distance: one lookup table of sub-query . centroid per sub-space,
+        # then each vector's score is the sum of m table lookups.
+        sub = self.codebooks.shape[2]
+        lut = np.einsum("jks,js->jk", self.codebooks, query.reshape(self.m, sub).astype(np.float32))
+        out = np.empty(len(codes), dtype=np.float32)
+        cols = np.arange(self.m)
+        for start in range(0, len(codes), BLOCK_SIZE):
+            out[start:start + BLOCK_SIZE] = lut[cols, codes[start:start + BLOCK_SIZE]].sum(axis=1)
+        return out
+
+
+class QuantizedIndex:
+    """Score compressed codes, then re-rank the best `rerank` candidates exactly."""
+
+    def __init__(self, quantizer, rerank: int = 200, max_train_points: int = 65536,
+                 seed: int = 0):
+        self.quantizer = quantizer
+        self.rerank = rerank
+        self.max_train_points = max_train_points
+        self.seed = seed
+        self._codes = None
+        self._size = 0
+
+    def train(self, vectors: np.ndarray):
+        if len(vectors) == 0:
+            raise ValueError("Cannot train a quantizer on zero vectors")
+        rng = np.random.default_rng(self.seed)
+        n = min(len(vectors), self.max_train_points)
+        sample = vectors[np.sort(rng.choice(len(vectors), size=n, replace=False))]
+        self.quantizer.train(np.asarray(sample, dtype=np.float32))
+        self._codes = None   # codes of the old quantizer (maybe another dimension) are stale
+        self._size = 0
+
+    def add(self, vectors: np.ndarray, start: int = 0):
+        needed = len(vectors)
+        if self._codes is None:
+            self._codes = np.empty((max(needed, 1024), self.quantizer.code_size), dtype=np.uint8)
+        elif needed > len(self._codes):
+            grown = np.empty((max(needed, 2 * len(self._codes)), self._codes.shape[1]),
+                             dtype=np.uint8)
+            grown[:self._size] = self._codes[:self._size]
+            self._codes = grown
+        for block in range(start, needed, BLOCK_SIZE):   # bounded float temporaries
+            end = min(block + BLOCK_SIZE, needed)
+            rows = np.asarray(vectors[block:end], dtype=np.float32)
+            self._codes[block:end] = self.quantizer.encode(rows)
+        self._size = needed
+
+    def search(self, vectors: np.ndarray, query: np.ndarray, top_k: int = 5,
+               rerank: int = None) -> tuple:
+        """
+        Return (rows, scores). With rerank=0 the scores are the approximate
+        code scores; otherwise the best `rerank` rows are re-scored exactly.
+        """
+        if self._size == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        approx = self.quantizer.scores(self._codes[:self._size], query)
+        rerank = self.rerank if rerank is None else rerank
+        if rerank <= 0:
+            rows = top_k_indices(approx, top_k)
+            return rows, approx[rows]
+        candidates = np.sort(top_k_indices(approx, max(rerank, top_k)))
+        exact = vectors[candidates] @ query
+        best = top_k_indices(exact, top_k)
+        return candidates[best], exact[best]
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the compressed codes."""
+        return 0 if self._codes is None else self._size * self._codes.shape[1]
+
+    def __len__(self):
+        return self._size
@@ -0,0 +1,194 @@
+"""
+Lesson 59: Vector Embeddings — Dimensionality Reduction
+
+Scoring cost and memory grow linearly with the number of dimensions, and
+real embeddings (1536 dims and more) carry most of their signal in far
+fewer directions. Two reducers with the same fit / transform API:
+
+PCAReducer        keep the top principal directions of a sample of the data
+                  (SVD without centering, so dot products are what is preserved)
+RandomProjection  multiply by a fixed random Gaussian matrix; needs no training
+                  data, distances survive approximately (Johnson-Lindenstrauss)
+
+FullVectorFile keeps the original vectors in an append-only float32 file,
+so a search can re-rank its reduced-space candidates at full precision
+while only the reduced matrix stays in RAM.
+
+save_reducer() / load_reducer() write a fitted reducer to an .npz file, so a
+saved (or checkpointed) reduced store reopens with the same projection.
+
+Usage:
+    db.attach_reducer(PCAReducer(256), full_vectors_path="full.f32", rerank=100)
+"""
+
+import os
+from pathlib import Path
+
+import numpy as np
+
+BLOCK_SIZE = 65536   # rows copied at a time when a file is rewritten
+
+
+class PCAReducer:
+    """Project onto the top principal directions of the training vectors."""
+
+    def __init__(self, n_components: int = 256, max_train_points: int = 65536, seed: int = 0):
+        self.n_components = n_components
+        self.max_train_points = max_train_points
+        self.seed = seed
+        self.components = None                 # (n_components, dims) float32
+        self.explained_variance_ratio = None
+
+    @property
+    def fitted(self) -> bool:
+        return self.components is not None
+
+    @property
+    def input_dims(self) -> int:
+        return self.components.shape[1]
+
+    def fit(self, vectors: np.ndarray):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if len(vectors) > self.max_train_points:
+            rng = np.random.default_rng(self.seed)
+            vectors = vectors[rng.choice(len(vectors), self.max_train_points, replace=False)]
+        _, s, vt = np.linalg.svd(vectors, full_matrices=False)
+        k = min(self.n_components, len(vt))
+        self.components = np.ascontiguousarray(vt[:k], dtype=np.float32)
+        energy = s ** 2
+        self.explained_variance_ratio = float(energy[:k].sum() / energy.sum())
+        return self
+
+    def transform(self, vectors: np.ndarray) -> np.ndarray:
+        return (np.asarray(vectors, dtype=np.float32) @ self.components.T).astype(np.float32)
+
+    def fit_transform(self, vectors: np.ndarray) -> np.ndarray:
+        return self.fit(vectors).transform(vectors)
+
+
+class RandomProjection:
+    """Multiply by a fixed (dims, n_components) Gaussian matrix."""
+
+    def __init__(self, n_components: int = 256, seed: int = 0):
+        self.n_components = n_components
+        self.seed = seed
+        self.matrix = None
+
+    @property
+    def fitted(self) -> bool:
+        return self.matrix is not None
+
+    @property
+    def input_dims(self) -> int:
+        return self.matrix.shape[0]
+
+    def fit(self, vectors: np.ndarray):
+        """Only the input dimension is used; any sample (even one row) will do."""
+        dims = np.asarray(vectors).shape[-1]
+        rng = np.random.default_rng(self.seed)
+        self.matrix = (rng.standard_normal((dims, self.n_components))
+                       / np.sqrt(self.n_components)).astype(np.float32)
+        return self
+
+    def transform(self, vectors: np.ndarray) -> np.ndarray:
+        return np.asarray(vectors, dtype=np.float32) @ self.matrix
+
+    def fit_transform(self, vectors: np.ndarray) -> np.ndarray:
+        return self.fit(vectors).transform(vectors)
+
+
+def save_reducer(reducer, path):
+    """Write a fitted PCAReducer or RandomProjection to `path` (.npz)."""
+    if isinstance(reducer, PCAReducer):
+        arrays = {"kind": "pca", "components": reducer.components,
+                  "explained_variance_ratio": reducer.explained_variance_ratio}
+    elif isinstance(reducer, RandomProjection):
+        arrays = {"kind": "random", "matrix": reducer.matrix}
+    else:
+        raise TypeError(f"Cannot save a {type(reducer).__name__}")
+    with open(path, "wb") as f:   # a file object: np.savez would otherwise append ".npz"
+        np.savez(f, n_components=reducer.n_components, seed=reducer.seed, **arrays)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def load_reducer(path):
+    """Read a reducer written by save_reducer()."""
+    with np.load(path) as data:
+        if str(data["kind"]) == "pca":
+            reducer = PCAReducer(int(data["n_components"]), seed=int(data["seed"]))
+            reducer.components = data["components"]
+            reducer.explained_variance_ratio = float(data["explained_variance_ratio"])
+        else:
+            reducer = RandomProjection(int(data["n_components"]), seed=int(data["seed"]))
+            reducer.matrix = data["matrix"]
+    return reducer
+
+
+class FullVectorFile:
+    """
+    Append-only float32 row file, read back through a (re-created) memmap.
+    With `source`, it starts as the first `count` rows of that file: they are
+    read in place until the first write, which copies them to `path` first,
+    so `source` (e.g. a saved store) is never modified.
+    """
+
+    def __init__(self, path, dims: int, source=None, count: int = 0):
+        self.path = Path(path)
+        self.dims = dims
+        self._source = None if source is None else Path(source)
+        self._count = count if source is not None else 0
+        self._file = None if source is not None else open(self.path, "wb")
+        self._map = None
+
+    def detach(self):
+        """Copy the source rows to `path` now (once), so `source` may be deleted."""
+        if self._file is not None:
+            return
+        self._map = None
+        with open(self.path, "wb") as f:
+            if self._count:
+                rows = np.memmap(self._source, dtype=np.float32, mode="r",
+                                 shape=(self._count, self.dims))
+                for start in range(0, self._count, BLOCK_SIZE):
+                    rows[start:start + BLOCK_SIZE].tofile(f)
+                del rows
+        self._source = None
+        self._file = open(self.path, "ab")
+
+    def append(self, vectors: np.ndarray):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dims)
+        self.detach()
+        self._file.write(vectors.tobytes())
+        self._count += len(vectors)
+        self._map = None
+
+    def take(self, rows) -> np.ndarray:
+        if self._map is None:
+            if self._file is not None:
+                self._file.flush()
+            self._map = np.memmap(self._source or self.path, dtype=np.float32, mode="r",
+                                  shape=(self._count, self.dims))
+        return self._map[rows]
+
+    def keep(self, rows: np.ndarray):
+        """Rewrite the file with only `rows`, in order (after a compaction)."""
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            for start in range(0, len(rows), BLOCK_SIZE):
+                self.take(rows[start:start + BLOCK_SIZE]).tofile(f)
+        self._map = None
+        if self._file is not None:
+            self._file.close()
+        os.replace(tmp, self.path)
+        self._source = None
+        self._file = open(self.path, "ab")
+        self._count = len(rows)
+
+    def close(self):
+        self._map = None
+        if self._file is not None:
+            self._file.close()
+
+    def __len__(self):
+        return self._count
@@ -0,0 +1,216 @@
+"""
+Lesson 59: Vector Embeddings — Concurrent Segmented Store
+
+SimpleVectorDB mutates its arrays and lists in place, so searching from one
+thread while another thread adds documents can see half-written state.
+SegmentedVectorStore splits the data into segments instead:
+
+- sealed segments: immutable arrays, never written again
+- one mutable tail segment: preallocated, rows are only ever appended
+- every write bumps a sequence number and publishes a new Snapshot
+  (the segment tuple, the tail's row count, the sequence number) with a
+  single reference assignment
+
+A reader grabs the current Snapshot and searches it without any lock:
+rows appended after it are beyond its tail count, and a delete stamps the
+row's `deleted_at` with a newer sequence number, which older snapshots
+ignore. Writers serialize on one lock; readers never wait for them.
+
+When the tail fills up it is sealed (trimmed copy) and a fresh tail starts.
+Once there are more than max_segments sealed segments they are merged into
+one, dropping deleted rows; old snapshots keep their own segment references.
+"""
+
+import threading
+from typing import NamedTuple
+
+import numpy as np
+from vector_math import normalize, top_k_indices
+
+NEVER = np.iinfo(np.int64).max   # deleted_at of a live row
+
+
+class Segment:
+    """Vectors plus parallel ids/texts/metadata; deleted_at[row] = seq of its delete."""
+
+    def __init__(self, capacity: int, dims: int):
+        self.vectors = np.empty((capacity, dims), dtype=np.float32)
+        self.deleted_at = np.full(capacity, NEVER, dtype=np.int64)
+        self.ids = []
+        self.texts = []
+        self.metadata = []
+
+    @classmethod
+    def from_rows(cls, parts: list, dims: int) -> "Segment":
+        """Sealed segment holding the given (segment, rows) selections, in order."""
+        n = sum(len(rows) for _, rows in parts)
+        seg = cls(n, dims)
+        pos = 0
+        for src, rows in parts:
+            seg.vectors[pos:pos + len(rows)] = src.vectors[rows]
+            seg.deleted_at[pos:pos + len(rows)] = src.deleted_at[rows]
+            for r in rows.tolist():
+                seg.ids.append(src.ids[r])
+                seg.texts.append(src.texts[r])
+                seg.metadata.append(src.metadata[r])
+            pos += len(rows)
+        seg.vectors.flags.writeable = False
+        return seg
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class Snapshot(NamedTuple):
+    """An immutable view of the store: (segment, visible row count) pairs at sequence `seq`."""
+
+    segments: tuple
+    seq: int
+
+    def search(self, query_vec, top_k: int = 5) -> list:
+        """Top-k result dicts (id, text, metadata, score) as of this snapshot."""
+        q = normalize(np.asarray(query_vec, dtype=np.float32))
+        all_scores, refs = [], []
+        for seg, n in self.segments:
+            if n == 0:
+                continue
+            scores = seg.vectors[:n] @ q
+            scores[seg.deleted_at[:n] <= self.seq] = -np.inf
+            best = top_k_indices(scores, top_k)
+            all_scores.append(scores[best])
+            refs.extend((seg, row) for row in best.tolist())
+        if not refs:
+            return []
+        scores = np.concatenate(all_scores)
+        results = []
+        for i in top_k_indices(scores, top_k).tolist():
+            if scores[i] == -np.inf:
+                break
+            seg, row = refs[i]
+            results.append({"id": seg.ids[row], "text": seg.texts[row],
+                            "metadata": seg.metadata[row], "score": float(scores[i])})
+        return results
+
+    def __len__(self):
+        return sum(int(np.count_nonzero(seg.deleted_at[:n] > self.seq))
+                   for seg, n in self.segments)
+
+
+class SegmentedVectorStore:
+    """Thread-safe store: lock-free snapshot reads, serialized appends to a tail segment."""
+
+    def __init__(self, dims: int, seal_rows: int = 4096, max_segments: int = 8):
+        self.dims = dims
+        self.seal_rows = seal_rows
+        self.max_segments = max_segments
+        self._lock = threading.Lock()
+        self._sealed = ()
+        self._tail = Segment(seal_rows, dims)
+        self._locations = {}   # doc id -> (segment, row)
+        self._next_id = 0
+        self._seq = 0
+        self._snapshot = Snapshot(((self._tail, 0),), 0)
+
+    # -- reads (no locking) ---------------------------------------------
+
+    def snapshot(self) -> Snapshot:
+        return self._snapshot
+
+    def search(self, query_vec, top_k: int = 5) -> list:
+        return self._snapshot.search(query_vec, top_k)
+
+    def __len__(self):
+        return len(self._snapshot)
+
+    def __contains__(self, doc_id) -> bool:
+        return doc_id in self._locations
+
+    # -- writes (serialized) --------------------------------------------
+
+    def add(self, text: str, vector, metadata: dict = None, doc_id=None):
+        return self.add_many([text], [vector], [metadata], [doc_id])[0]
+
+    def add_many(self, texts: list, vectors, metadatas: list = None,
+                 doc_ids: list = None) -> list:
+        """Append documents and publish them in one new snapshot. Returns their ids."""
+        metadatas = metadatas if metadatas is not None else [None] * len(texts)
+        doc_ids = doc_ids if doc_ids is not None else [None] * len(texts)
+        with self._lock:
+            seq = self._seq + 1
+            out = [self._append(text, vec, meta, doc_id)
+                   for text, vec, meta, doc_id in zip(texts, vectors, metadatas, doc_ids)]
+            self._publish(seq)
+        return out
+
+    def delete(self, doc_id) -> bool:
+        with self._lock:
+            seq = self._seq + 1
+            found = self._delete(doc_id, seq)
+            if found:
+                self._publish(seq)
+        return found
+
+    def upsert(self, doc_id, text: str, vector, metadata: dict = None):
+        """Replace a document; readers see either the old or the new version, never neither."""
+        with self._lock:
+            seq = self._seq + 1
+            self._delete(doc_id, seq)
+            self._append(text, vector, metadata, doc_id)
+            self._publish(seq)
+        return doc_id
+
+    def seal(self):
+        """Freeze the current tail into an immutable segment (also happens when it is full)."""
+        with self._lock:
+            self._seal()
+            self._publish(self._seq)
+
+    def _append(self, text, vector, metadata, doc_id):
+        if doc_id is None:
+            while self._next_id in self._locations:
+                self._next_id += 1
+            doc_id = self._next_id
+            self._next_id += 1
+        elif doc_id in self._locations:
+            raise KeyError(f"Document id {doc_id!r} already exists, use upsert()")
+        if len(self._tail) == self.seal_rows:
+            self._seal()
+        row = len(self._tail)
+        self._tail.vectors[row] = normalize(np.asarray(vector, dtype=np.float32))
+        self._tail.metadata.append(metadata or {})
+        self._tail.texts.append(text)
+        self._tail.ids.append(doc_id)   # appended last: len(tail) counts complete rows only
+        self._locations[doc_id] = (self._tail, row)
+        return doc_id
+
+    def _delete(self, doc_id, seq) -> bool:
+        location = self._locations.pop(doc_id, None)
+        if location is None:
+            return False
+        seg, row = location
+        seg.deleted_at[row] = seq
+        return True
+
+    def _seal(self):
+        if len(self._tail) == 0:
+            return
+        # Rows deleted up to now are invisible to every future snapshot, so drop them
+        live = np.flatnonzero(self._tail.deleted_at[:len(self._tail)] == NEVER)
+        sealed = Segment.from_rows([(self._tail, live)], self.dims)
+        self._tail = Segment(self.seal_rows, self.dims)
+        if len(sealed):
+            self._sealed += (sealed,)
+            self._relocate(sealed)
+        if len(self._sealed) > self.max_segments:
+            parts = [(seg, np.flatnonzero(seg.deleted_at == NEVER)) for seg in self._sealed]
+            self._sealed = (Segment.from_rows(parts, self.dims),)
+            self._relocate(self._sealed[0])
+
+    def _relocate(self, seg: Segment):
+        for row, doc_id in enumerate(seg.ids):
+            self._locations[doc_id] = (seg, row)
+
+    def _publish(self, seq: int):
+        self._seq = seq
+        segments = tuple((seg, len(seg)) for seg in self._sealed)
+        self._snapshot = Snapshot(segments + ((self._tail, len(self._tail)),), seq)
@@ -0,0 +1,110 @@
+"""
+Lesson 59: Vector Embeddings — Sharded Multi-Process Search
+
+One Python process only uses one core for the Python parts of a search, so
+ShardedSearcher spreads exact search over a pool of worker processes:
+
+1. The store is saved once (SimpleVectorDB.save) and every worker opens the
+   vectors with np.memmap, so all processes share the OS page cache and no
+   vectors are ever pickled
+2. The rows are split into contiguous shards; each query batch is fanned out
+   to every shard
+3. Each worker returns its shard's top-k, and the parent merges the sorted
+   per-shard lists with a heap
+
+The pool uses the platform's default start method unless mp_context says
+otherwise; under spawn the calling script must keep its top-level code under
+`if __name__ == "__main__":`.
+
+Tip: start the program with OMP_NUM_THREADS=1 (or similar for your BLAS) so
+the workers do not also fight over cores with BLAS threads.
+"""
+
+import heapq
+import json
+import multiprocessing
+import os
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+from document_file import META_FILE, VECTORS_FILE, open_documents
+from vector_math import running_top_k
+
+BLOCK_ROWS = 65536             # rows scored at a time inside a worker
+
+_worker_vectors = None
+
+
+def _init_worker(path: str, dtype: str, shape: tuple):
+    global _worker_vectors
+    _worker_vectors = np.memmap(path, dtype=dtype, mode="r", shape=shape)
+
+
+def _search_shard(task: tuple) -> tuple:
+    """Top-k (rows, scores) of one shard for a batch of queries, best first per query."""
+    start, end, queries, top_k = task
+    blocks = (
+        (s, _worker_vectors[s:min(s + BLOCK_ROWS, end)]) for s in range(start, end, BLOCK_ROWS)
+    )
+    return running_top_k(blocks, queries, top_k)
+
+
+class ShardedSearcher:
+    """Exact search over a saved store, fanned out to a pool of worker processes."""
+
+    def __init__(self, store_dir, n_workers: int = None, n_shards: int = None,
+                 mp_context=None):
+        store_dir = Path(store_dir)
+        with open(store_dir / META_FILE, encoding="utf-8") as f:
+            meta = json.load(f)
+        self._documents = open_documents(store_dir)   # rows decoded on demand
+        self.count = meta["count"]
+        self.n_workers = n_workers or os.cpu_count() or 1
+        n_shards = max(1, min(n_shards or self.n_workers, self.count))
+        bounds = np.linspace(0, self.count, n_shards + 1).astype(int)
+        self.shards = [(int(a), int(b)) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+        self._pool = None
+        if self.count == 0:
+            return   # nothing to search, and an empty vectors file cannot be mapped
+        ctx = mp_context or multiprocessing.get_context()
+        self._pool = ctx.Pool(
+            self.n_workers,
+            initializer=_init_worker,
+            initargs=(str(store_dir / VECTORS_FILE), meta["dtype"], (meta["count"], meta["dims"])),
+        )
+
+    def search_vectors(self, queries: np.ndarray, top_k: int = 5) -> list:
+        """For each (normalized) query row, a best-first list of (score, row)."""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if self.count == 0:
+            return [[] for _ in queries]
+        tasks = [(start, end, queries, top_k) for start, end in self.shards]
+        shard_results = self._pool.map(_search_shard, tasks)
+        merged = []
+        for q in range(len(queries)):
+            per_shard = [
+                list(zip(scores[q].tolist(), rows[q].tolist())) for rows, scores in shard_results
+            ]
+            best = heapq.merge(*per_shard, key=lambda hit: hit[0], reverse=True)
+            merged.append(list(islice(best, top_k)))
+        return merged
+
+    def search_many(self, query_vectors: np.ndarray, top_k: int = 5) -> list:
+        """Result dicts (id, text, metadata, score) for each query vector."""
+        return [
+            [dict(zip(("id", "text", "metadata"), self._documents[row]), score=score)
+             for score, row in hits]
+            for hits in self.search_vectors(query_vectors, top_k)
+        ]
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -3,19 +3,71 @@ Lesson 59: Vector Embeddings — Solutions
 """
 
 import numpy as np
-import hashlib
+import asyncio
 import json
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+
+import benchmark
+from bm25_index import BM25Index
+from chunking import iter_file_chunks
+from dedup import MinHashLSH
+from document_file import (
+    DOCUMENTS_FILE,
+    META_FILE,
+    OFFSETS_FILE,
+    VECTORS_FILE,
+    document_columns,
+    gc_paused,
+    open_documents,
+    write_documents,
+)
+from embedding_cache import CachedEmbedder
+from fake_embeddings import embed_many
+from hnsw_index import HNSWIndex
+from ingest_pipeline import IngestPipeline
+from ivf_index import IVFIndex
+from metadata_index import MetadataIndex
+from out_of_core import DiskSearcher, search_file
+from quantization import ProductQuantizer, QuantizedIndex, ScalarQuantizer
+from reduction import FullVectorFile, PCAReducer, RandomProjection, load_reducer, save_reducer
+from segmented_store import SegmentedVectorStore
+from sharded_search import ShardedSearcher
+from wal import WriteAheadLog
+from vector_math import (
+    cosine_one_to_many,
+    normalize,
+    normalize_rows,
+    reciprocal_rank_fusion,
+    top_k_indices,
+    top_k_per_row,
+)
 
 
 def fake_embedding(text: str, dims: int = 64) -> list:
-    seed = int(hashlib.md5(text.lower().strip().encode()).hexdigest(), 16) % (2**32)
-    np.random.seed(seed)
-    vec = np.random.randn(dims)
-    vec = vec / np.linalg.norm(vec)
-    return vec.tolist()
+    # Counter-based RNG per text: no global np.random state, safe across threads
+    return embed_many([text], dims)[0].tolist()
+
+fake_embedding.embed_many = embed_many   # batch entry point, see get_embeddings()
 
 get_embedding = fake_embedding
 
+
+def get_embeddings(texts: list) -> np.ndarray:
+    """Embed many texts at once, using the embedder's batch API when it has one."""
+    batch = getattr(get_embedding, "embed_many", None)
+    if batch is not None:
+        return np.asarray(batch(texts), dtype=np.float32)
+    return np.array([get_embedding(t) for t in texts], dtype=np.float32)
+
+
 KNOWLEDGE_BASE = [
     "Python is a high-level, interpreted programming language.",
     "NumPy provides N-dimensional array objects for numerical computing.",
@@ -37,79 +89,754 @@ def cosine_similarity(a: list, b: list) -> float:
     return float(np.dot(a_arr, b_arr) / (np.linalg.norm(a_arr) * np.linalg.norm(b_arr)))
 
 
-print("=" * 50)
-print("Cosine Similarity")
-print("=" * 50)
-vec1 = get_embedding("machine learning")
-vec2 = get_embedding("machine learning")
-print(f"Same text: {cosine_similarity(vec1, vec2):.4f}")
-vec3 = get_embedding("Python programming")
-vec4 = get_embedding("banana bread recipe")
-print(f"Different text: {cosine_similarity(vec3, vec4):.4f}")
+if __name__ == "__main__":
+    print("=" * 50)
+    print("Cosine Similarity")
+    print("=" * 50)
+    vec1 = get_embedding("machine learning")
+    vec2 = get_embedding("machine learning")
+    print(f"Same text: {cosine_similarity(vec1, vec2):.4f}")
+    vec3 = get_embedding("Python programming")
+    vec4 = get_embedding("banana bread recipe")
+    print(f"Different text: {cosine_similarity(vec3, vec4):.4f}")
 
 
 # SOLUTION 2: Semantic Search
 def semantic_search(query: str, documents: list, top_k: int = 3) -> list:
-    query_emb = get_embedding(query)
-    scored = []
-    for doc in documents:
-        doc_emb = get_embedding(doc)
-        score = cosine_similarity(query_emb, doc_emb)
-        scored.append((score, doc))
-    scored.sort(reverse=True)
-    return scored[:top_k]
+    # One batched embedding call and one matrix-vector product, no per-document loop
+    scores = cosine_one_to_many(get_embedding(query), get_embeddings(documents))
+    return [(float(scores[i]), documents[i]) for i in top_k_indices(scores, top_k)]
 
 
-print("\n" + "=" * 50)
-print("Semantic Search")
-print("=" * 50)
-for query in ["How do I build a web API?", "What library for math and arrays?"]:
-    print(f"\nQuery: '{query}'")
-    for score, doc in semantic_search(query, KNOWLEDGE_BASE, top_k=2):
-        print(f"  [{score:.3f}] {doc}")
+if __name__ == "__main__":
+    print("\n" + "=" * 50)
+    print("Semantic Search")
+    print("=" * 50)
+    for query in ["How do I build a web API?", "What library for math and arrays?"]:
+        print(f"\nQuery: '{query}'")
+        for score, doc in semantic_search(query, KNOWLEDGE_BASE, top_k=2):
+            print(f"  [{score:.3f}] {doc}")
 
 
 # SOLUTION 3: Vector Database
 class SimpleVectorDB:
-    def __init__(self):
-        self._documents = []
-    
-    def add(self, text: str, metadata: dict = None):
-        embedding = get_embedding(text)
-        self._documents.append({
+    """
+    In-memory vector store backed by one contiguous float32 matrix.
+
+    Embeddings are normalized once at insert time, so a query is a single
+    matrix-vector product followed by a partial top-k selection. Texts and
+    metadata live in lists parallel to the matrix rows.
+
+    Every document has a stable id (returned by add()). delete() only marks
+    its row in a tombstone bitmap and upsert() is delete + add, so neither
+    touches the matrix; compact() rewrites the arrays without dead rows.
+
+    An optional approximate index (IVFIndex, HNSWIndex, QuantizedIndex) can be attached with
+    build_index(); search() then only scores the candidates it proposes.
+    Documents added afterwards are inserted into the index as they arrive.
+
+    SimpleVectorDB(vectors_path="vectors.f32") keeps the matrix in a
+    memory-mapped file instead of RAM. With a QuantizedIndex attached, only
+    its compressed codes stay resident: the file is read for the re-ranked
+    candidates alone.
+
+    save(path) / SimpleVectorDB.open(path) persist the store as a flat float32
+    file plus a JSON-lines document file; open() memory-maps both and decodes
+    nothing up front, so start-up is instant and processes opening the same
+    files share one page-cache copy. Results decode only their own rows; the
+    document lists and the metadata index are built on first use.
+
+    search(..., where={"source": "kb"}) filters on metadata through an
+    inverted index, then scores only the matching rows (always exactly).
+
+    build_keyword_index() adds a BM25 index over the texts; hybrid_search()
+    fuses its ranking with the vector ranking (reciprocal-rank fusion).
+
+    build_dedup_index(MinHashLSH()) makes add() check every new text against
+    an LSH index first: a near-duplicate is not embedded or stored, add()
+    returns the id of the document already holding it (policy="merge" also
+    folds the new metadata into that document).
+
+    SimpleVectorDB.open_durable(path) adds a write-ahead log and periodic
+    snapshots: after a crash it reloads the last snapshot and replays only
+    the operations logged since, vectors included.
+
+    attach_reducer(PCAReducer(256)) stores (and searches) projected vectors
+    instead of the full embeddings; with full_vectors_path the originals are
+    appended to a file and the best `rerank` candidates re-scored with them.
+    save() keeps the reducer and the full vectors, open() re-attaches them.
+    """
+
+    DEDUP_POLICIES = ("reject", "merge")
+
+    VECTORS_FILE = VECTORS_FILE
+    META_FILE = META_FILE
+    REDUCER_FILE = "reducer.npz"
+    FULL_VECTORS_FILE = "full.f32"
+    SAVE_BLOCK_ROWS = 65536
+
+    def __init__(self, capacity: int = 1024, vectors_path=None):
+        self._capacity = capacity
+        self._vectors = None          # (capacity, dims) float32, rows [0, _size) are in use
+        self._vectors_path = None if vectors_path is None else Path(vectors_path)
+        self._texts = []
+        self._metadata = []
+        self._ids = []                # stable document id of each row
+        self._row_of = {}             # document id -> row holding its current version
+        self._deleted = np.zeros(capacity, dtype=bool)   # tombstone bitmap
+        self._n_deleted = 0
+        self._next_id = 0
+        self._size = 0
+        self._index = None
+        self._meta_index = MetadataIndex()
+        self._keyword_index = None
+        self._dedup = None
+        self._dedup_policy = "reject"
+        self._wal = None
+        self._checkpoint_every = None
+        self._reducer = None
+        self._full_vectors = None     # FullVectorFile of un-reduced rows, when kept
+        self._rerank = 0
+        self._saved = None            # DocumentFile of an opened store, until the lists are built
+
+    def _ensure_documents(self):
+        """Decode an opened store's documents into the id/text/metadata lists, once."""
+        if self._saved is None:
+            return
+        saved, self._saved = self._saved, None
+        self._ids, self._texts, self._metadata = document_columns(saved)
+        self._row_of = {doc_id: row for row, doc_id in enumerate(self._ids)}
+
+    def _allocate(self, rows: int, dims: int) -> np.ndarray:
+        """An uninitialized (rows, dims) matrix: in RAM, or a new file at vectors_path."""
+        if self._vectors_path is None:
+            return np.empty((rows, dims), dtype=np.float32)
+        with open(self._vectors_path, "wb") as f:
+            f.truncate(rows * dims * 4)
+        return np.memmap(self._vectors_path, dtype=np.float32, mode="r+", shape=(rows, dims))
+
+    def _ensure_capacity(self, dims: int, needed: int):
+        if self._vectors is None:
+            self._vectors = self._allocate(max(self._capacity, needed), dims)
+        elif dims != self._vectors.shape[1]:
+            raise ValueError(f"Expected {self._vectors.shape[1]}-dim embedding, got {dims}")
+        elif needed > len(self._vectors):
+            rows = max(needed, 2 * len(self._vectors))
+            if self._vectors_path is not None:
+                # File-backed: extend the file in place and map it again, no copy through RAM
+                if not self._vectors.flags.writeable:   # still the saved file open() mapped
+                    shutil.copyfile(self._vectors.filename, self._vectors_path)
+                os.truncate(self._vectors_path, rows * dims * 4)
+                self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+",
+                                          shape=(rows, dims))
+            else:
+                grown = np.empty((rows, dims), dtype=np.float32)
+                grown[:self._size] = self._vectors[:self._size]
+                self._vectors = grown
+        if needed > len(self._deleted):
+            extra = max(needed - len(self._deleted), len(self._deleted))
+            self._deleted = np.concatenate([self._deleted, np.zeros(extra, dtype=bool)])
+
+    def add(self, text: str, metadata: dict = None, doc_id=None, embedding=None):
+        """
+        Embed and store a document. Returns its id (auto-assigned if not given),
+        or the id of an existing near-duplicate when a dedup index rejects it.
+        Pass `embedding` to store a vector computed elsewhere.
+        """
+        self._ensure_documents()
+        if doc_id is not None and doc_id in self._row_of:
+            raise KeyError(f"Document id {doc_id!r} already exists, use upsert()")
+        signature = None
+        if self._dedup is not None:
+            signature = self._dedup.signature(text)
+            match = self._dedup.find(signature)
+            if match is not None:
+                if self._dedup_policy == "merge" and metadata:
+                    self._merge_metadata(self._row_of[match[0]], metadata)
+                return match[0]
+        if doc_id is None:
+            while self._next_id in self._row_of:
+                self._next_id += 1
+            doc_id = self._next_id
+            self._next_id += 1
+        return self._append(text, metadata, doc_id, signature, embedding)
+
+    def add_many(self, texts: list, metadatas: list = None, embeddings=None) -> list:
+        """Add several documents, embedding them in one batch call. Returns their ids."""
+        if embeddings is None:
+            embeddings = get_embeddings(texts)
+        metadatas = metadatas if metadatas is not None else [None] * len(texts)
+        return [self.add(text, metadata, embedding=vec)
+                for text, metadata, vec in zip(texts, metadatas, embeddings)]
+
+    def _append(self, text: str, metadata: dict, doc_id, signature=None, embedding=None):
+        self._ensure_documents()
+        if embedding is None:
+            embedding = get_embedding(text)
+        vec = normalize(np.asarray(embedding, dtype=np.float32))
+        stored = vec if self._reducer is None else self._reduce(vec[None])[0]
+        self._ensure_capacity(len(stored), self._size + 1)
+        if self._full_vectors is not None:
+            self._full_vectors.detach()   # the only step below that reads another file
+        self._log({"op": "add", "id": doc_id, "text": text, "metadata": metadata or {}}, vec)
+        if self._full_vectors is not None:
+            self._full_vectors.append(vec)
+        row = self._size
+        self._vectors[row] = stored
+        self._texts.append(text)
+        self._metadata.append(metadata or {})
+        self._ids.append(doc_id)
+        self._row_of[doc_id] = row
+        if self._meta_index is not None:
+            self._meta_index.add(row, self._metadata[-1])
+        if self._keyword_index is not None:
+            self._keyword_index.add(row, text)
+        self._size += 1
+        if self._index is not None:
+            self._index.add(self._vectors[:self._size], row)
+        if self._dedup is not None:
+            if signature is None:
+                signature = self._dedup.signature(text)
+            self._dedup.add(doc_id, signature)
+        return doc_id
+
+    def _merge_metadata(self, row: int, metadata: dict):
+        """Fold `metadata` into a stored row: new keys are added, differing values listed."""
+        self._ensure_documents()
+        merged = dict(self._metadata[row])
+        added = {}
+        for key, value in metadata.items():
+            if key not in merged:
+                merged[key] = added[key] = value
+            elif merged[key] != value:
+                old = merged[key] if isinstance(merged[key], list) else [merged[key]]
+                extra = [v for v in (value if isinstance(value, list) else [value])
+                         if v not in old]
+                if extra:
+                    merged[key] = old + extra
+                    added[key] = extra
+        if added:
+            self._log({"op": "merge", "id": self._ids[row], "metadata": added})
+        self._metadata[row] = merged
+        if self._meta_index is not None:
+            self._meta_index.add(row, added)
+
+    def upsert(self, doc_id, text: str, metadata: dict = None):
+        """Insert or replace the document with this id (never rejected as a duplicate)."""
+        self.delete(doc_id)
+        return self._append(text, metadata, doc_id)
+
+    def delete(self, doc_id) -> bool:
+        """Tombstone a document. Returns False if the id is unknown."""
+        self._ensure_documents()
+        if doc_id not in self._row_of:
+            return False
+        self._log({"op": "delete", "id": doc_id})
+        row = self._row_of.pop(doc_id)
+        self._deleted[row] = True
+        self._n_deleted += 1
+        if self._dedup is not None:
+            self._dedup.remove(doc_id)
+        return True
+
+    @property
+    def deleted_ratio(self) -> float:
+        """Fraction of stored rows that are tombstones (a hint for when to compact())."""
+        return self._n_deleted / self._size if self._size else 0.0
+
+    def compact(self) -> int:
+        """
+        Rewrite the arrays without tombstoned rows and rebuild every attached
+        index over the new row numbers. Returns the number of rows removed.
+        """
+        if self._n_deleted == 0:
+            return 0
+        self._ensure_documents()
+        live = np.flatnonzero(~self._deleted[:self._size])
+        removed = self._size - len(live)
+        if self._full_vectors is not None:
+            self._full_vectors.keep(live)
+        dims = self._vectors.shape[1]
+        rows = max(self._capacity, len(live))
+        if self._vectors_path is not None:
+            tmp = self._vectors_path.with_name(self._vectors_path.name + ".tmp")
+            with open(tmp, "wb") as f:
+                for start in range(0, len(live), self.SAVE_BLOCK_ROWS):
+                    self._vectors[live[start:start + self.SAVE_BLOCK_ROWS]].tofile(f)
+                f.truncate(rows * dims * 4)
+            os.replace(tmp, self._vectors_path)
+            vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r+",
+                                shape=(rows, dims))
+        else:
+            vectors = np.empty((rows, dims), dtype=np.float32)
+            vectors[:len(live)] = self._vectors[live]
+        self._vectors = vectors
+        self._texts = [self._texts[r] for r in live.tolist()]
+        self._metadata = [self._metadata[r] for r in live.tolist()]
+        self._ids = [self._ids[r] for r in live.tolist()]
+        self._row_of = {doc_id: row for row, doc_id in enumerate(self._ids)}
+        self._deleted = np.zeros(len(vectors), dtype=bool)
+        self._n_deleted = 0
+        self._size = len(live)
+
+        self._meta_index = None   # rebuilt by the next where= query
+        if self._keyword_index is not None:
+            old = self._keyword_index
+            self.build_keyword_index(BM25Index(k1=old.k1, b=old.b))
+        if self._index is not None:
+            if self._size:
+                self.build_index(self._index)
+            else:
+                self._index = None
+        return removed
+
+    def build_index(self, index):
+        """(Re)train `index` on the stored vectors, index them, and use it for search()."""
+        index.train(self.vectors)
+        index.add(self.vectors, 0)
+        self._index = index
+        return index
+
+    def drop_index(self):
+        self._index = None
+
+    def build_keyword_index(self, index=None):
+        """Index every stored text in a BM25Index (kept up to date by add())."""
+        index = index if index is not None else BM25Index()
+        self._ensure_documents()
+        for row, text in enumerate(self._texts):
+            index.add(row, text)
+        self._keyword_index = index
+        return index
+
+    def build_dedup_index(self, index=None, policy: str = "reject"):
+        """
+        Register every live text in a near-duplicate index (MinHashLSH by
+        default) and check each later add() against it. Documents already
+        stored are kept even if they duplicate each other.
+        """
+        if policy not in self.DEDUP_POLICIES:
+            raise ValueError(f"policy must be one of {self.DEDUP_POLICIES}, got {policy!r}")
+        index = index if index is not None else MinHashLSH()
+        self._ensure_documents()
+        for doc_id, row in self._row_of.items():
+            index.add(doc_id, index.signature(self._texts[row]))
+        self._dedup = index
+        self._dedup_policy = policy
+        return index
+
+    def drop_dedup_index(self):
+        self._dedup = None
+
+    def attach_reducer(self, reducer, full_vectors_path=None, rerank: int = 100):
+        """
+        Project every stored vector (and later documents and queries) with
+        `reducer` (fit on the stored vectors unless already fitted). With
+        `full_vectors_path`, the full vectors are kept in that file and each
+        search re-scores its best max(top_k, rerank) candidates with them.
+        """
+        if self._reducer is not None:
+            raise RuntimeError("A reducer is already attached")
+        if self._vectors_path is not None:
+            raise RuntimeError("A file-backed store cannot be reduced; use a QuantizedIndex")
+        full = self.vectors
+        if not reducer.fitted:
+            if len(full) == 0:
+                raise ValueError("Fit the reducer first, or add documents before attaching it")
+            reducer.fit(full[~self._deleted[:self._size]])
+        if len(full) and full.shape[1] != reducer.input_dims:
+            raise ValueError(f"Reducer expects {reducer.input_dims}-dim vectors, "
+                             f"the store holds {full.shape[1]}-dim vectors")
+        # Build everything aside first: if any step fails, the store is unchanged
+        reduced = np.empty((max(self._capacity, len(full)), reducer.n_components),
+                           dtype=np.float32)
+        for start in range(0, len(full), self.SAVE_BLOCK_ROWS):
+            block = full[start:start + self.SAVE_BLOCK_ROWS]
+            reduced[start:start + len(block)] = normalize_rows(reducer.transform(block))
+        if self._index is not None:
+            self._index.train(reduced[:len(full)])
+            self._index.add(reduced[:len(full)], 0)
+        full_vectors = None
+        if full_vectors_path is not None:
+            full_vectors = FullVectorFile(full_vectors_path, reducer.input_dims)
+            for start in range(0, len(full), self.SAVE_BLOCK_ROWS):
+                full_vectors.append(full[start:start + self.SAVE_BLOCK_ROWS])
+        self._reducer = reducer
+        if len(full):
+            self._vectors = reduced
+        if full_vectors is not None:
+            self._full_vectors = full_vectors
+            self._rerank = rerank
+        if self._wal is not None:
+            # Recovery only knows about the reducer once a snapshot holds it
+            self._log({"op": "attach_reducer"})
+            self.checkpoint()
+        return reducer
+
+    def _reduce(self, vectors: np.ndarray) -> np.ndarray:
+        return normalize_rows(self._reducer.transform(vectors)).astype(np.float32)
+
+    def _embed_queries(self, queries: list) -> tuple:
+        """(search-space query vectors, full query vectors) for a list of query texts."""
+        full = normalize_rows(get_embeddings(queries)).astype(np.float32)
+        return (full if self._reducer is None else self._reduce(full)), full
+
+    def _candidates(self, top_k: int) -> int:
+        return max(top_k, self._rerank) if self._full_vectors is not None else top_k
+
+    def _finish(self, rows, scores, full_query: np.ndarray, top_k: int) -> list:
+        """Result dicts for candidate rows, re-scored at full precision when kept on disk."""
+        rows, scores = np.asarray(rows), np.asarray(scores)
+        if self._full_vectors is not None and len(rows):
+            scores = self._full_vectors.take(rows) @ full_query
+            best = top_k_indices(scores, top_k)
+            rows, scores = rows[best], scores[best]
+        return [self._result(r, s) for r, s in zip(rows.tolist(), scores.tolist())]
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """Read-only view of every stored (normalized) row, tombstones included."""
+        if self._vectors is None:
+            return np.empty((0, 0), dtype=np.float32)
+        view = self._vectors[:self._size]
+        view.flags.writeable = False
+        return view
+
+    def search(self, query: str, top_k: int = 5, where: dict = None, **search_params) -> list:
+        """
+        Return the top_k most similar documents, best first.
+        `where` restricts the search to documents whose metadata matches.
+        Extra keyword arguments (e.g. nprobe=) are passed to the attached index.
+        """
+        if len(self) == 0:
+            return []
+        query_emb, full_query = self._embed_query(query)
+        rows, scores = self._dense_search(query_emb, self._candidates(top_k), where,
+                                          **search_params)
+        return self._finish(rows, scores, full_query, top_k)
+
+    def _embed_query(self, query: str) -> tuple:
+        full = normalize(np.asarray(get_embedding(query), dtype=np.float32))
+        return (full if self._reducer is None else self._reduce(full[None])[0]), full
+
+    def _metadata_index(self) -> MetadataIndex:
+        if self._meta_index is None:
+            self._ensure_documents()
+            index = MetadataIndex()
+            with gc_paused():
+                for row, metadata in enumerate(self._metadata):
+                    index.add(row, metadata)
+            self._meta_index = index
+        return self._meta_index
+
+    def _filtered_rows(self, where: dict) -> np.ndarray:
+        rows = self._metadata_index().rows(where)
+        return rows[~self._deleted[rows]] if self._n_deleted else rows
+
+    def _index_search(self, query_emb: np.ndarray, top_k: int, **search_params) -> tuple:
+        # Tombstoned rows can still come back from the index: over-fetch until
+        # top_k live rows survive (or the index has nothing more to give).
+        k = top_k
+        while True:
+            rows, scores = self._index.search(self._vectors[:self._size], query_emb, k,
+                                              **search_params)
+            if not self._n_deleted:
+                return rows, scores
+            keep = ~self._deleted[rows]
+            if keep.sum() >= top_k or len(rows) < k or k >= self._size:
+                return rows[keep][:top_k], scores[keep][:top_k]
+            k *= 2
+
+    def _dense_search(self, query_emb: np.ndarray, top_k: int, where: dict = None,
+                      **search_params) -> tuple:
+        """(rows, scores) of the best matches for an already-normalized query vector."""
+        if where:
+            rows = self._filtered_rows(where)
+            scores = self._vectors[rows] @ query_emb
+            best = top_k_indices(scores, top_k)
+            return rows[best], scores[best]
+        if self._index is not None:
+            return self._index_search(query_emb, top_k, **search_params)
+        scores = self._vectors[:self._size] @ query_emb
+        if self._n_deleted:
+            scores[self._deleted[:self._size]] = -np.inf
+        best = top_k_indices(scores, min(top_k, len(self)))
+        return best, scores[best]
+
+    def hybrid_search(self, query: str, top_k: int = 5, candidates: int = 50,
+                      rrf_k: int = 60, where: dict = None, **search_params) -> list:
+        """
+        Combine keyword (BM25) and vector search with reciprocal-rank fusion.
+        Each side contributes its best `candidates` rows; "score" is the fused score.
+        """
+        if self._keyword_index is None:
+            raise RuntimeError("Call build_keyword_index() before hybrid_search()")
+        if len(self) == 0:
+            return []
+        query_emb, _ = self._embed_query(query)
+        dense_rows, _ = self._dense_search(query_emb, candidates, where, **search_params)
+        allowed = self._filtered_rows(where) if where else None
+        keyword_rows, _ = self._keyword_index.search(query, candidates + self._n_deleted,
+                                                     rows=allowed)
+        if self._n_deleted:
+            keyword_rows = keyword_rows[~self._deleted[keyword_rows]]
+        rows, fused = reciprocal_rank_fusion(
+            [dense_rows.tolist(), keyword_rows[:candidates].tolist()], rrf_k
+        )
+        return [self._result(r, s) for r, s in zip(rows[:top_k], fused[:top_k])]
+
+    def search_many(self, queries: list, top_k: int = 5, where: dict = None,
+                    max_block_elems: int = 2**24, **search_params) -> list:
+        """
+        search() for many queries: one batched embedding call, then one
+        matrix-matrix product per block of queries (blocks are sized so the
+        score matrix stays under max_block_elems floats).
+        Returns one result list per query, in order.
+        """
+        if not queries:
+            return []
+        if len(self) == 0:
+            return [[] for _ in queries]
+        query_embs, full_queries = self._embed_queries(queries)
+        fetch = self._candidates(top_k)
+        if self._index is not None and not where:
+            out = []
+            for q, full_q in zip(query_embs, full_queries):
+                rows, scores = self._index_search(q, fetch, **search_params)
+                out.append(self._finish(rows, scores, full_q, top_k))
+            return out
+        rows = self._filtered_rows(where) if where else None
+        vectors = self._vectors[:self._size] if rows is None else self._vectors[rows]
+        if len(vectors) == 0:
+            return [[] for _ in queries]
+        dead = self._deleted[:self._size] if rows is None and self._n_deleted else None
+        k = min(fetch, len(self)) if dead is not None else fetch
+        block = max(1, max_block_elems // len(vectors))
+        out = []
+        for start in range(0, len(query_embs), block):
+            scores = query_embs[start:start + block] @ vectors.T
+            if dead is not None:
+                scores[:, dead] = -np.inf
+            best = top_k_per_row(scores, k)
+            best_scores = np.take_along_axis(scores, best, axis=1)
+            if rows is not None:
+                best = rows[best]
+            for hits, hit_scores, full_q in zip(best, best_scores,
+                                                full_queries[start:start + block]):
+                out.append(self._finish(hits, hit_scores, full_q, top_k))
+        return out
+
+    def _result(self, row: int, score: float) -> dict:
+        if self._saved is not None:   # decode just this row of an opened store
+            doc_id, text, metadata = self._saved[row]
+        else:
+            doc_id, text, metadata = self._ids[row], self._texts[row], self._metadata[row]
+        return {
+            "id": doc_id,
             "text": text,
-            "embedding": embedding,
-            "metadata": metadata or {}
-        })
-    
-    def search(self, query: str, top_k: int = 5) -> list:
-        query_emb = np.array(get_embedding(query))
-        scored = []
-        for item in self._documents:
-            vec = np.array(item["embedding"])
-            score = float(np.dot(query_emb, vec) / (np.linalg.norm(query_emb) * np.linalg.norm(vec)))
-            scored.append({**item, "score": score})
-        scored.sort(key=lambda x: x["score"], reverse=True)
-        return scored[:top_k]
-    
+            "embedding": self._vectors[row].tolist(),
+            "metadata": metadata,
+            "score": float(score),
+        }
+
+    def save(self, path):
+        """Write the live documents to directory `path` (vectors + metadata sidecar)."""
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        self._ensure_documents()
+        live = np.flatnonzero(~self._deleted[:self._size])
+        meta = {
+            "format": 3,
+            "dtype": "float32",
+            "count": len(live),
+            "dims": 0 if self._vectors is None else self._vectors.shape[1],
+            "next_id": self._next_id,
+            "reducer": None if self._reducer is None else {
+                "rerank": self._rerank,
+                "full_vectors": self._full_vectors is not None,
+            },
+        }
+        # Write to temp files and rename, so a crash never leaves a half-written store
+        renames = [(path / (self.VECTORS_FILE + ".tmp"), path / self.VECTORS_FILE)]
+        with open(renames[-1][0], "wb") as f:
+            for start in range(0, len(live), self.SAVE_BLOCK_ROWS):
+                self._vectors[live[start:start + self.SAVE_BLOCK_ROWS]].tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+        renames.append((path / (DOCUMENTS_FILE + ".tmp"), path / DOCUMENTS_FILE))
+        renames.append((path / (OFFSETS_FILE + ".tmp"), path / OFFSETS_FILE))
+        write_documents(((self._ids[r], self._texts[r], self._metadata[r]) for r in live.tolist()),
+                        renames[-2][0], renames[-1][0], len(live))
+        if self._reducer is not None:
+            renames.append((path / (self.REDUCER_FILE + ".tmp"), path / self.REDUCER_FILE))
+            save_reducer(self._reducer, renames[-1][0])
+        if self._full_vectors is not None:
+            renames.append((path / (self.FULL_VECTORS_FILE + ".tmp"),
+                            path / self.FULL_VECTORS_FILE))
+            with open(renames[-1][0], "wb") as f:
+                for start in range(0, len(live), self.SAVE_BLOCK_ROWS):
+                    self._full_vectors.take(live[start:start + self.SAVE_BLOCK_ROWS]).tofile(f)
+                f.flush()
+                os.fsync(f.fileno())
+        renames.append((path / (self.META_FILE + ".tmp"), path / self.META_FILE))
+        with open(renames[-1][0], "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        for tmp, final in renames:   # meta.json last: it is what open() trusts
+            os.replace(tmp, final)
+
+    @classmethod
+    def open(cls, path, full_vectors_path=None, vectors_path=None) -> "SimpleVectorDB":
+        """
+        Open a saved store with its vectors memory-mapped read-only.
+        Pages are loaded lazily by the OS. Adding documents copies the matrix
+        into RAM, or with `vectors_path` into that file (a file-backed store);
+        attached indexes are not saved, call build_index() again.
+        A saved reducer is re-attached. Its full vectors are read from the
+        saved file until the first write copies them to `full_vectors_path`
+        (default: "full.f32.open" next to it), so the save stays intact.
+        """
+        path = Path(path)
+        with open(path / cls.META_FILE, encoding="utf-8") as f:
+            meta = json.load(f)
+        db = cls(vectors_path=vectors_path)
+        db._size = meta["count"]
+        db._next_id = meta.get("next_id", db._size)
+        db._deleted = np.zeros(max(db._size, 1), dtype=bool)
+        # Nothing is decoded here: results read single rows of the document file,
+        # and the lists, id lookup and metadata index are built when first needed
+        db._saved = open_documents(path)
+        db._meta_index = None
+        # Keyword and dedup indexes are not saved either; build_*_index() re-creates them.
+        if meta.get("reducer"):
+            db._reducer = load_reducer(path / cls.REDUCER_FILE)
+            db._rerank = meta["reducer"]["rerank"]
+            if meta["reducer"]["full_vectors"]:
+                db._full_vectors = FullVectorFile(
+                    full_vectors_path or path / (cls.FULL_VECTORS_FILE + ".open"),
+                    db._reducer.input_dims, source=path / cls.FULL_VECTORS_FILE,
+                    count=db._size,
+                )
+        if db._size:
+            db._vectors = np.memmap(path / cls.VECTORS_FILE, dtype=meta["dtype"], mode="r",
+                                    shape=(meta["count"], meta["dims"]))
+        return db
+
+    @classmethod
+    def open_durable(cls, path, fsync_interval: float = 1.0,
+                     checkpoint_every: int = 10_000) -> "SimpleVectorDB":
+        """
+        Open (or create) a crash-safe store in directory `path`: the latest
+        snapshot is loaded and the write-ahead log after it replayed, with
+        the logged vectors (nothing is re-embedded). From then on every add,
+        delete and metadata merge is logged before it is applied, and a new
+        snapshot is taken every `checkpoint_every` logged operations.
+        """
+        wal = WriteAheadLog(path, fsync_interval)
+        db = cls()
+        if wal.snapshot_path is not None:
+            db = cls.open(wal.snapshot_path,
+                          full_vectors_path=wal.directory / cls.FULL_VECTORS_FILE)
+            # The next checkpoint deletes this snapshot directory: nothing may
+            # still be read from it lazily once recovery is over
+            db._ensure_documents()
+            if db._vectors is not None:
+                db._vectors = np.array(db._vectors)
+            if db._full_vectors is not None:
+                db._full_vectors.detach()
+        for record, vector in wal.replay():
+            db._apply(record, vector)
+        db._wal = wal
+        db._checkpoint_every = checkpoint_every
+        return db
+
+    def _apply(self, record: dict, vector):
+        op, doc_id = record["op"], record.get("id")
+        if op == "add":
+            self._append(record["text"], record["metadata"], doc_id, embedding=vector)
+            if isinstance(doc_id, int) and doc_id >= self._next_id:
+                self._next_id = doc_id + 1
+        elif op == "delete":
+            self.delete(doc_id)
+        elif op == "merge":
+            self._merge_metadata(self._row_of[doc_id], record["metadata"])
+        elif op == "clear":
+            self.clear()
+        # "attach_reducer" needs no replay: it is followed by a checkpoint, and
+        # without that snapshot the logged full vectors are stored unreduced
+
+    def _log(self, record: dict, vector: np.ndarray = None):
+        if self._wal is None:
+            return
+        # Checkpoint before logging, so the snapshot holds every earlier operation
+        if self._wal.lsn - self._wal.snapshot_lsn >= self._checkpoint_every:
+            self.checkpoint()
+        self._wal.append(record, vector)
+
+    def checkpoint(self):
+        """Snapshot the store and drop the log records it covers (durable stores only)."""
+        if self._wal is None:
+            raise RuntimeError("checkpoint() needs a store opened with open_durable()")
+        lsn = self._wal.lsn
+        if lsn == self._wal.snapshot_lsn:
+            return
+        self._wal.sync()
+        self.save(self._wal.snapshot_dir(lsn))
+        self._wal.publish_snapshot(lsn)
+
+    @property
+    def wal(self):
+        """The WriteAheadLog of a store opened with open_durable(), else None."""
+        return self._wal
+
+    def close(self):
+        """Flush and fsync the write-ahead log of a durable store."""
+        if self._wal is not None:
+            self._wal.close()
+
+    def __contains__(self, doc_id) -> bool:
+        self._ensure_documents()
+        return doc_id in self._row_of
+
     def __len__(self):
-        return len(self._documents)
-    
+        return self._size - self._n_deleted
+
     def clear(self):
-        self._documents = []
+        self._log({"op": "clear"})
+        self._vectors = None
+        self._texts = []
+        self._metadata = []
+        self._ids = []
+        self._row_of = {}
+        self._deleted = np.zeros(self._capacity, dtype=bool)
+        self._n_deleted = 0
+        self._next_id = 0
+        self._size = 0
+        self._index = None
+        self._meta_index = MetadataIndex()
+        self._keyword_index = None
+        self._dedup = None
+        self._saved = None
+        if self._full_vectors is not None:
+            self._full_vectors.close()
+        self._reducer = None
+        self._full_vectors = None
+        self._rerank = 0
 
 
-print("\n" + "=" * 50)
-print("Vector Database")
-print("=" * 50)
-db = SimpleVectorDB()
-for doc in KNOWLEDGE_BASE:
-    db.add(doc, metadata={"source": "knowledge_base"})
-print(f"Size: {len(db)} documents")
-results = db.search("How do I build a web API?", top_k=3)
-print("\nTop 3 results:")
-for r in results:
-    print(f"  [{r['score']:.3f}] {r['text']}")
+if __name__ == "__main__":
+    print("\n" + "=" * 50)
+    print("Vector Database")
+    print("=" * 50)
+    db = SimpleVectorDB()
+    for doc in KNOWLEDGE_BASE:
+        db.add(doc, metadata={"source": "knowledge_base"})
+    print(f"Size: {len(db)} documents")
+    results = db.search("How do I build a web API?", top_k=3)
+    print("\nTop 3 results:")
+    for r in results:
+        print(f"  [{r['score']:.3f}] {r['text']}")
 
 
 # SOLUTION 4: Document Chunker
@@ -126,10 +853,548 @@ def chunk_text(text: str, chunk_size: int = 100, overlap: int = 20) -> list:
     return chunks
 
 
-print("\n" + "=" * 50)
-print("Document Chunking")
-print("=" * 50)
-long_doc = "Python is great. " * 200
-chunks = chunk_text(long_doc, chunk_size=50, overlap=10)
-print(f"~{len(long_doc.split())} words → {len(chunks)} chunks")
-print(f"Chunk 1: {chunks[0][:80]}...")
+if __name__ == "__main__":
+    print("\n" + "=" * 50)
+    print("Document Chunking")
+    print("=" * 50)
+    long_doc = "Python is great. " * 200
+    chunks = chunk_text(long_doc, chunk_size=50, overlap=10)
+    print(f"~{len(long_doc.split())} words → {len(chunks)} chunks")
+    print(f"Chunk 1: {chunks[0][:80]}...")
+
+
+# BONUS: Approximate Search with an IVF Index
+if __name__ == "__main__":
+    print("\n" + "=" * 50)
+    print("IVF Index (approximate search)")
+    print("=" * 50)
+    ivf_db = SimpleVectorDB()
+    for i in range(2000):
+        ivf_db.add(f"synthetic document {i}", metadata={"id": i})
+    exact = [r["text"] for r in ivf_db.search("synthetic document 42", top_k=10)]
+    ivf_db.build_index(IVFIndex(n_lists=32, nprobe=4))
+    for nprobe in (1, 4, 16, 32):
+        approx = [r["text"] for r in ivf_db.search("synthetic document 42", top_k=10, nprobe=nprobe)]
+        recall = len(set(exact) & set(approx)) / len(exact)
+        print(f"  nprobe={nprobe:>2}: recall@10 = {recall:.0%}")
+
+
+# BONUS: Incremental HNSW Graph Index
+if __name__ == "__main__":
+    print("\n" + "=" * 50)
+    print("HNSW Index (incremental graph search)")
+    print("=" * 50)
+    hnsw_db = SimpleVectorDB()
+    hnsw_db.build_index(HNSWIndex(M=12, ef_construction=40))   # attach before ingest
+    for i in range(1000):
+        hnsw_db.add(f"synthetic document {i}", metadata={"id": i})   # linked in as it arrives
+    query_vec = normalize(np.asarray(get_embedding("synthetic document 42"), dtype=np.float32))
+    exact_rows = set(top_k_indices(hnsw_db.vectors @ query_vec, 10).tolist())
+    for ef in (10, 50, 200):
+        approx = hnsw_db.search("synthetic document 42", top_k=10, ef_search=ef)
+        found = {r["metadata"]["id"] for r in approx}
+        print(f"  ef_search={ef:>3}: recall@10 = {len(exact_rows & found) / 10:.0%}")
+
+
+# BONUS: Compressed Vectors with Exact Re-ranking
+if __name__ == "__main__":
+    print("\n" + "=" * 50)
+    print("Quantized Index (int8 / product quantization)")
+    print("=" * 50)
+    quant_db = SimpleVectorDB()
+    for i in range(2000):
+        quant_db.add(f"synthetic document {i}", metadata={"id": i})
+    query_vec = normalize(np.asarray(get_embedding("synthetic document 7"), dtype=np.float32))
+    exact_rows = set(top_k_indices(quant_db.vectors @ query_vec, 10).tolist())
+    print(f"  float32 vectors: {quant_db.vectors.nbytes:>7,} bytes")
+    for name, quantizer in [("int8", ScalarQuantizer()), ("PQ m=8", ProductQuantizer(m=8, ks=64))]:
+        index = quant_db.build_index(QuantizedIndex(quantizer, rerank=100))
+        for rerank in (0, 100):
+            found = {r["metadata"]["id"] for r in quant_db.search("synthetic document 7", top_k=10,
+                                                                 rerank=rerank)}
+            print(f"  {name:<6} codes: {index.nbytes:>7,} bytes, rerank={rerank:<3} "
+                  f"recall@10 = {len(exact_rows & found) / 10:.0%}")
+
+    # Compressed storage: the float32 rows live in a memory-mapped file, only the codes in RAM
+    with tempfile.TemporaryDirectory() as quant_dir:
+        disk_db = SimpleVectorDB(vectors_path=os.path.join(quant_dir, "vectors.f32"))
+        disk_db.add_many([f"synthetic document {i}" for i in range(2000)],
+                         [{"id": i} for i in range(2000)])
+        disk_index = disk_db.build_index(QuantizedIndex(ProductQuantizer(m=8, ks=64), rerank=100))
+        found = {r["metadata"]["id"] for r in disk_db.search("synthetic document 7", top_k=10)}
+        print(f"  file-backed + PQ: {disk_index.nbytes:,} bytes in RAM, "
+              f"{disk_db.vectors.nbytes:,} bytes on disk, "
+              f"recall@10 = {len(exact_rows & found) / 10:.0%}")
+
+
+# BONUS: Saving and Memory-Mapping the Store
+if __name__ == "__main__":
+    print("\n" + "=" * 50)
+    print("Persistence (save / memory-mapped open)")
+    print("=" * 50)
+    with tempfile.TemporaryDirectory() as store_dir:
+        db.save(store_dir)
+        reopened = SimpleVectorDB.open(store_dir)
+        print(f"Reopened {len(reopened)} documents, vectors backed by {type(reopened.vectors).__name__}")
+        for r in reopened.search("How do I build a web API?", top_k=2):
+            print(f"  [{r['score']:.3f}] {r['text']}")
+        del reopened   # release the memory map before the directory is removed
+
+        big_db = SimpleVectorDB()
+        big_db.add_many([f"ticket {i}" for i in range(20_000)],
+                        [{"tenant": i % 50} for i in range(20_000)])
+        big_db.save(store_dir)
+        start = time.perf_counter()
+        cold = SimpleVectorDB.open(store_dir)
+        open_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        cold.search("ticket 7", top_k=3, where={"tenant": 7})
+        print(f"{len(cold):,} documents: open() {open_ms:.1f} ms (nothing decoded), first "
+              f"where= query {(time.perf_counter() - start) * 1000:.0f} ms (builds the filter index)")
+        del cold
+
+
+# BONUS: Caching Embeddings (memory LRU + SQLite)
+if __name__ == "__main__":
+    print("\n" + "=" * 50)
+    print("Embedding Cache")
+    print("=" * 50)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache_path = os.path.join(cache_dir, "embeddings.sqlite")
+        get_embedding = CachedEmbedder(fake_embedding, model="fake-64", db_path=cache_path,
+                                       batch_fn=embed_many)
+        for _ in range(3):
+            semantic_search("How do I build a web API?", KNOWLEDGE_BASE, top_k=2)
+        print(f"Same process:  {get_embedding.stats()}")
+        get_embedding.close()
+
+        # A "restarted" process starts with an empty memory tier but a warm disk tier
+        get_embedding = CachedEmbedder(fake_embedding, model="fake-64", db_path=cache_path,
+                                       batch_fn=embed_many)
+        semantic_search("How do I build a web API?", KNOWLEDGE_BASE, top_k=2)
+        print(f"After restart: {get_embedding.stats()}")
+        get_embedding.close()
+    get_embedding = fake_embedding
+
+
+# BONUS: Batched, Thread-Safe Fake Embeddings
+if __name__ == "__main__":
+    print("\n" + "=" * 50)
+    print("Batched Fake Embeddings")
+    print("=" * 50)
+    corpus = [f"synthetic document {i}" for i in range(100_000)]
+    start = time.perf_counter()
+    matrix = embed_many(corpus)
+    print(f"embed_many: {matrix.shape} {matrix.dtype} in {time.perf_counter() - start:.2f}s")
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        parts = list(pool.map(embed_many, [corpus[i::4] for i in range(4)]))
+    print(f"Threaded results match: {np.array_equal(parts[1][0], matrix[1])}")
+
+
+# BONUS: Precomputed Corpus for Repeated Semantic Search
+class SemanticCorpus:
+    """
+    semantic_search() for a document collection that rarely changes.
+
+    Documents are embedded once into a normalized float32 matrix; each query
+    is then one embedding call and one matrix-vector product. The corpus owns
+    its documents: add() and remove() update the matrix as they go (and bump
+    `version`), so a search never has to check for changes. A text already
+    in the corpus is not embedded again.
+    """
+
+    def __init__(self, documents=(), embed_batch=None):
+        self.embed_batch = embed_batch or get_embeddings
+        self._docs = []
+        self._matrix = None
+        self.version = 0
+        self.embed_calls = 0
+        self.add(documents)
+
+    @property
+    def documents(self) -> tuple:
+        return tuple(self._docs)
+
+    def add(self, documents):
+        """Append documents (an iterable of texts), embedding only unseen ones."""
+        documents = list(documents)
+        if not documents:
+            return
+        known = {doc: row for row, doc in enumerate(self._docs)}
+        new_docs = list(dict.fromkeys(d for d in documents if d not in known))
+        pool = self._matrix
+        if new_docs:
+            self.embed_calls += len(new_docs)
+            fresh = normalize_rows(np.asarray(self.embed_batch(new_docs), dtype=np.float32))
+            known.update({doc: len(self._docs) + i for i, doc in enumerate(new_docs)})
+            pool = fresh if pool is None else np.concatenate([pool, fresh])
+        # Existing rows, then one row per added document (repeats share an embedding)
+        self._matrix = np.concatenate([pool[:len(self._docs)], pool[[known[d] for d in documents]]])
+        self._docs.extend(documents)
+        self.version += 1
+
+    def remove(self, document: str):
+        """Remove the first occurrence of `document` (ValueError if absent, like list.remove)."""
+        row = self._docs.index(document)
+        del self._docs[row]
+        self._matrix = np.delete(self._matrix, row, axis=0)
+        self.version += 1
+
+    def __len__(self):
+        return len(self._docs)
+
+    def search(self, query: str, top_k: int = 3) -> list:
+        """Same result format as semantic_search(): list of (score, document)."""
+        if not self._docs:
+            return []
+        query_emb = normalize(np.asarray(get_embedding(query), dtype=np.float32))
+        scores = self._matrix @ query_emb
+        return [(float(scores[i]), self._docs[i]) for i in top_k_indices(scores, top_k)]
+
+
+if __name__ == "__main__":
+    print("\n" + "=" * 50)
+    print("Precomputed Corpus")
+    print("=" * 50)
+    corpus_index = SemanticCorpus(KNOWLEDGE_BASE)
+    for query in ["How do I build a web API?", "What library for math and arrays?"] * 50:
+        corpus_index.search(query, top_k=2)
+    print(f"100 queries, {len(corpus_index)} documents -> {corpus_index.embed_calls} "
+          f"document embeddings")
+    corpus_index.add(["NumPy arrays support fast vectorized math."])
+    score, doc = corpus_index.search("NumPy arrays support fast vectorized math.", top_k=1)[0]
+    print(f"Top hit after adding a document: [{score:.3f}] {doc}")
+    removed = KNOWLEDGE_BASE[0]
+    corpus_index.remove(removed)
+    corpus_index.add(["Rust is a systems programming language focused on memory safety."])
+    score, doc = corpus_index.search("Rust is a systems programming language focused on memory safety.",
+                                     top_k=1)[0]
+    gone = all(hit != removed for _, hit in corpus_index.search(removed, top_k=len(corpus_index)))
+    print(f"After remove() + add(): top hit [{score:.3f}] {doc}")
+    print(f"Removed document no longer returned: {gone}; "
+          f"version {corpus_index.version}, document embeddings so far: {corpus_index.embed_calls}")
+
+
+# BONUS: Batch Queries
+if __name__ == "__main__":
+    print("\n" + "=" * 50)
+    print("Multi-Query Search")
+    print("=" * 50)
+    quant_db.drop_index()
+    batch_queries = [f"synthetic document {i}" for i in range(0, 2000, 2)]
+    start = time.perf_counter()
+    looped = [quant_db.search(q, top_k=5) for q in batch_queries]
+    loop_time = time.perf_counter() - start
+    start = time.perf_counter()
+    batched = quant_db.search_many(batch_queries, top_k=5)
+    batch_time = time.perf_counter() - start
+    same = all([r["text"] for r in a] == [r["text"] for r in b] for a, b in zip(looped, batched))
+    print(f"{len(batch_queries)} queries: loop {loop_time:.3f}s, search_many {batch_time:.3f}s, "
+          f"same results: {same}")
+
+
+# BONUS: Filtered Search on Metadata
+if __name__ == "__main__":
+    print("\n" + "=" * 50)
+    print("Filtered Search")
+    print("=" * 50)
+    tenant_db = SimpleVectorDB()
+    for i, doc in enumerate(KNOWLEDGE_BASE * 3):
+        tenant_db.add(doc, metadata={"tenant": ["acme", "globex", "initech"][i % 3],
+                                     "tags": ["kb", "v2"] if i % 2 else ["kb"]})
+    for r in tenant_db.search("How do I build a web API?", top_k=3,
+                              where={"tenant": "globex", "tags": "v2"}):
+        print(f"  [{r['score']:.3f}] {r['metadata']} {r['text']}")
+    hits = tenant_db.search_many(["Python", "Git"], top_k=2, where={"tenant": ["acme", "initech"]})
+    print(f"  search_many tenants: {[[r['metadata']['tenant'] for r in res] for res in hits]}")
+    tenant_db.add("Tagged twice by a sloppy importer.", metadata={"tenant": "acme", "tags": ["x", "x"]})
+    twice = tenant_db.search("Tagged twice", top_k=5, where={"tags": "x", "tenant": "acme"})
+    print(f"  repeated tag value: {len(twice)} hit(s)")
+
+
+# BONUS: Hybrid Keyword + Vector Search
+if __name__ == "__main__":
+    print("\n" + "=" * 50)
+    print("Hybrid Search (BM25 + vectors, reciprocal-rank fusion)")
+    print("=" * 50)
+    hybrid_db = SimpleVectorDB()
+    for doc in KNOWLEDGE_BASE + [
+        "Error ERR_CONN_RESET means the server closed the connection unexpectedly.",
+        "Model gpt-4o-mini is a small, fast GPT model.",
+    ]:
+        hybrid_db.add(doc)
+    hybrid_db.build_keyword_index()
+    for query in ["ERR_CONN_RESET", "which gpt-4o-mini model"]:
+        print(f"\nQuery: '{query}'")
+        print(f"  vector only: {hybrid_db.search(query, top_k=1)[0]['text']}")
+        for r in hybrid_db.hybrid_search(query, top_k=2):
+            print(f"  hybrid [{r['score']:.4f}] {r['text']}")
+
+
+# BONUS: Streaming Chunker with Source Offsets
+if __name__ == "__main__":
+    print("\n" + "=" * 50)
+    print("Streaming Chunker")
+    print("=" * 50)
+    with tempfile.TemporaryDirectory() as chunk_dir:
+        big_file = os.path.join(chunk_dir, "big.txt")
+        with open(big_file, "w", encoding="utf-8") as f:
+            for _ in range(500):
+                f.write(long_doc)   # ~300k words, never loaded at once below
+        n_chunks = sum(1 for _ in iter_file_chunks(big_file, size=50, overlap=10))
+        print(f"{os.path.getsize(big_file):,} bytes -> {n_chunks:,} word chunks")
+        with open(big_file, "rb") as f:
+            for chunk in islice(iter_file_chunks(big_file, size=3, overlap=1, unit="sentence"), 2):
+                f.seek(chunk.start)
+                same = f.read(chunk.end - chunk.start).decode() == chunk.text
+                print(f"  [{chunk.start}:{chunk.end}] {chunk.text!r} (matches source: {same})")
+        blob_file = os.path.join(chunk_dir, "blob.txt")
+        with open(blob_file, "wb") as f:
+            f.write(b"QUJD" * (1 << 20))   # 4 MB without whitespace, e.g. inline base64
+        blob_chunks = list(iter_file_chunks(blob_file, size=50, overlap=10))
+        print(f"4 MB run without whitespace -> {len(blob_chunks)} chunks, largest "
+              f"{max(len(c.text) for c in blob_chunks):,} chars (units capped at 1,000)")
+
+
+# BONUS: Upsert, Delete and Compaction
+if __name__ == "__main__":
+    print("\n" + "=" * 50)
+    print("Upsert / Delete / Compact")
+    print("=" * 50)
+    crud_db = SimpleVectorDB()
+    for i, doc in enumerate(KNOWLEDGE_BASE):
+        crud_db.add(doc, metadata={"source": "kb"}, doc_id=f"kb-{i}")
+    crud_db.upsert("kb-3", "FastAPI builds REST APIs with automatic OpenAPI docs.", {"source": "kb"})
+    crud_db.delete("kb-6")   # the Eiffel Tower does not belong here
+    print(f"Live: {len(crud_db)}, tombstones: {crud_db.deleted_ratio:.0%} of rows")
+    print(f"Top hit: {crud_db.search('FastAPI builds REST APIs with automatic OpenAPI docs.', top_k=1)[0]['id']}")
+    print(f"Compacted away {crud_db.compact()} rows; 'kb-6' in db: {'kb-6' in crud_db}")
+
+
+# BONUS: Sharded Multi-Process Search
+if __name__ == "__main__":
+    print("\n" + "=" * 50)
+    print("Sharded Search (worker processes over a memory-mapped store)")
+    print("=" * 50)
+    shard_db = SimpleVectorDB()
+    for i in range(10_000):
+        shard_db.add(f"synthetic document {i}", metadata={"id": i})
+    shard_queries = [f"synthetic document {i}" for i in range(0, 10_000, 20)]
+    with tempfile.TemporaryDirectory() as shard_dir:
+        shard_db.save(shard_dir)
+        with ShardedSearcher(shard_dir, n_workers=4) as searcher:
+            start = time.perf_counter()
+            sharded = searcher.search_many(normalize_rows(get_embeddings(shard_queries)), top_k=5)
+            print(f"{len(shard_queries)} queries over {len(searcher.shards)} shards "
+                  f"in {time.perf_counter() - start:.3f}s")
+    single = shard_db.search_many(shard_queries, top_k=5)
+    same = all([r["id"] for r in a] == [r["id"] for r in b] for a, b in zip(sharded, single))
+    print(f"Same results as single-process search_many: {same}")
+
+
+# BONUS: Benchmarking Search Backends
+# Full sweeps: python benchmark.py --sizes 10000,1000000 --backends flat "ivf:nprobe=16" ...
+if __name__ == "__main__":
+    print("\n" + "=" * 50)
+    print("Benchmark (recall@k and latency per backend)")
+    print("=" * 50)
+    benchmark.main(["--sizes", "5000", "--queries", "50",
+                    "--backends", "flat", "ivf:n_lists=32,nprobe=4", "sq8:rerank=50"])
+
+
+# BONUS: Near-Duplicate Suppression at Ingest
+if __name__ == "__main__":
+    print("\n" + "=" * 50)
+    print("Near-Duplicate Suppression (MinHash LSH)")
+    print("=" * 50)
+    dedup_db = SimpleVectorDB()
+    dedup_db.build_dedup_index(MinHashLSH(threshold=0.8))
+    chunk_ids = {dedup_db.add(chunk, metadata={"source": "long_doc"}) for chunk in chunks}
+    print(f"{len(chunks)} chunks of the repeated document -> {len(dedup_db)} stored "
+          f"(ids returned: {sorted(chunk_ids)})")
+
+    merge_db = SimpleVectorDB()
+    merge_db.build_dedup_index(policy="merge")
+    for i, doc in enumerate(KNOWLEDGE_BASE):
+        merge_db.add(doc, metadata={"source": "kb"}, doc_id=f"kb-{i}")
+    mirror_id = merge_db.add("  PYTHON is a high-level,   interpreted programming language.",
+                             metadata={"source": "mirror"})
+    mirror_hit = merge_db.search("Python", top_k=1, where={"source": "mirror"})[0]
+    print(f"Mirror copy merged into {mirror_id!r}: {mirror_hit['metadata']}")
+
+
+# BONUS: Async Ingestion Pipeline
+if __name__ == "__main__":
+    print("\n" + "=" * 50)
+    print("Async Ingestion Pipeline")
+    print("=" * 50)
+
+    flaky_rng = random.Random(59)
+
+
+async def flaky_remote_embed(texts: list) -> np.ndarray:
+    """Stand-in for an embeddings API: 20ms per request, 10% transient failures."""
+    await asyncio.sleep(0.02)
+    if flaky_rng.random() < 0.1:
+        raise ConnectionError("upstream reset")
+    return embed_many(texts)
+
+
+if __name__ == "__main__":
+    pipe_db = SimpleVectorDB()
+    pipe_docs = [(f"{doc} (copy {i})", {"copy": i}) for i in range(200) for doc in KNOWLEDGE_BASE]
+    pipeline = IngestPipeline(flaky_remote_embed, write=pipe_db.add_many, batch_size=32,
+                              concurrency=8, max_retries=5, backoff=0.01)
+    pipe_stats = asyncio.run(pipeline.run(pipe_docs))
+    print(f"{pipe_stats['chunks']} chunks in {pipe_stats['batches']} batches, "
+          f"{pipe_stats['retries']} retries, {pipe_stats['seconds']}s "
+          f"(one request per text: ~{0.02 * len(pipe_docs):.0f}s)")
+    print(f"Stored: {len(pipe_db)}, top hit: {pipe_db.search(pipe_docs[7][0], top_k=1)[0]['text']!r}")
+
+
+async def rejecting_embed(texts: list) -> np.ndarray:
+    """A backend error that is not worth retrying (bad input, not a network blip)."""
+    await asyncio.sleep(0.001)
+    raise ValueError("input rejected by embedding model")
+
+
+if __name__ == "__main__":
+    failing = IngestPipeline(rejecting_embed, write=pipe_db.add_many, batch_size=4, concurrency=2)
+    try:
+        asyncio.run(failing.run(KNOWLEDGE_BASE * 10))
+    except ValueError as exc:
+        print(f"Non-retryable error stops every stage and is raised: {exc}")
+
+
+# BONUS: Concurrent Reads During Ingestion
+if __name__ == "__main__":
+    print("\n" + "=" * 50)
+    print("Snapshot Reads While Writing (segmented store)")
+    print("=" * 50)
+    live_store = SegmentedVectorStore(dims=64, seal_rows=1000)
+    live_texts = [f"streamed document {i}" for i in range(5000)]
+    live_vectors = get_embeddings(live_texts)
+
+    live_row = {text: row for row, text in enumerate(live_texts)}
+
+
+def search_while_ingesting(stop: threading.Event) -> tuple:
+    """
+    Search in a loop until stopped. Returns (searches, inconsistent results):
+    results that miss a row visible at snap.seq or include one added later.
+    """
+    searches = inconsistent = 0
+    while not stop.is_set():
+        snap = live_store.snapshot()
+        visible = len(snap)   # writes only append, so it holds exactly live_texts[:visible]
+        for row in (visible - 1, visible):   # newest visible row, first row not yet visible
+            if not 0 <= row < len(live_texts):
+                continue
+            found = [live_row[hit["text"]] for hit in snap.search(live_vectors[row], top_k=3)]
+            searches += 1
+            inconsistent += max(found, default=-1) >= visible or (row < visible and found[0] != row)
+    return searches, inconsistent
+
+
+if __name__ == "__main__":
+    stop_readers = threading.Event()
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        readers = [pool.submit(search_while_ingesting, stop_readers) for _ in range(4)]
+        for start in range(0, len(live_texts), 100):
+            live_store.add_many(live_texts[start:start + 100], live_vectors[start:start + 100])
+        stop_readers.set()
+        searches, inconsistent = map(sum, zip(*(reader.result() for reader in readers)))
+    print(f"Ingested {len(live_store)} docs while {searches} searches ran, "
+          f"{inconsistent} results inconsistent with their snapshot")
+    print(f"Sealed segments: {len(live_store.snapshot().segments) - 1}, "
+          f"top hit: {live_store.search(live_vectors[4321], top_k=1)[0]['text']!r}")
+
+
+# BONUS: Write-Ahead Log and Crash Recovery
+if __name__ == "__main__":
+    print("\n" + "=" * 50)
+    print("Write-Ahead Log + Snapshots")
+    print("=" * 50)
+    with tempfile.TemporaryDirectory() as wal_dir:
+        durable_db = SimpleVectorDB.open_durable(wal_dir, checkpoint_every=8)
+        for i, doc in enumerate(KNOWLEDGE_BASE):
+            durable_db.add(doc, metadata={"source": "kb"}, doc_id=f"kb-{i}")
+        durable_db.delete("kb-6")
+        durable_db.close()
+        with open(next(Path(wal_dir).glob("wal-*.log")), "ab") as f:
+            f.write(b"\x40\x00\x00\x00torn")   # a record cut short by a crash
+        recovered = SimpleVectorDB.open_durable(wal_dir)
+        print(f"Snapshot at lsn {recovered.wal.snapshot_lsn}, replayed {recovered.wal.replayed} "
+              f"log records -> {len(recovered)} documents, 'kb-6' in db: {'kb-6' in recovered}")
+        print(f"Top hit: {recovered.search(KNOWLEDGE_BASE[3], top_k=1)[0]['id']}")
+        recovered.close()
+
+
+# BONUS: Out-of-Core Exact Search
+if __name__ == "__main__":
+    print("\n" + "=" * 50)
+    print("Out-of-Core Search (streamed blocks, bounded memory)")
+    print("=" * 50)
+    with tempfile.TemporaryDirectory() as disk_dir:
+        disk_corpus = benchmark.make_corpus(200_000)
+        disk_corpus.tofile(os.path.join(disk_dir, "big.f32"))
+        disk_queries = benchmark.make_queries(disk_corpus, 20)
+        start = time.perf_counter()
+        disk_rows, _ = search_file(os.path.join(disk_dir, "big.f32"), disk_queries, dims=64,
+                                   top_k=5, block_rows=16_384)
+        print(f"{disk_corpus.nbytes / 2**20:.0f} MB file, 3 x {16_384 * 64 * 4 / 2**20:.0f} MB "
+              f"block buffers, {len(disk_queries)} queries in {time.perf_counter() - start:.3f}s")
+        same = np.array_equal(disk_rows, benchmark.ground_truth(disk_corpus, disk_queries, 5))
+        print(f"Same rows as in-memory exact search: {same}")
+
+        db.save(disk_dir)
+        git_query = normalize_rows(get_embeddings(KNOWLEDGE_BASE[8:9]))
+        disk_hit = DiskSearcher(disk_dir).search_many(git_query, top_k=1)[0][0]
+        print(f"DiskSearcher over the saved store: [{disk_hit['score']:.3f}] {disk_hit['text']}")
+
+
+# BONUS: Dimensionality Reduction with Full-Precision Re-ranking
+if __name__ == "__main__":
+    print("\n" + "=" * 50)
+    print("Reduced Vectors (PCA / random projection)")
+    print("=" * 50)
+    reduce_texts = [f"synthetic document {i}" for i in range(2000)]
+    reduce_queries = reduce_texts[::40]
+    exact_db = SimpleVectorDB()
+    exact_db.add_many(reduce_texts)
+    exact_ids = [{r["id"] for r in hits} for hits in exact_db.search_many(reduce_queries, top_k=5)]
+    with tempfile.TemporaryDirectory() as reduce_dir:
+        for name, reducer, keep_full in [
+            ("PCA 64 -> 16", PCAReducer(16), False),
+            ("random 64 -> 16", RandomProjection(16), False),
+            ("PCA 64 -> 16 + re-rank", PCAReducer(16), True),
+        ]:
+            small_db = SimpleVectorDB()
+            small_db.add_many(reduce_texts)
+            full_path = os.path.join(reduce_dir, "full.f32") if keep_full else None
+            small_db.attach_reducer(reducer, full_vectors_path=full_path, rerank=200)
+            found = small_db.search_many(reduce_queries, top_k=5)
+            recall = np.mean([len(want & {r["id"] for r in hits}) / 5
+                              for want, hits in zip(exact_ids, found)])
+            print(f"{name:<24} RAM {small_db.vectors.nbytes / 1024:.0f} KB "
+                  f"(full: {exact_db.vectors.nbytes / 1024:.0f} KB), recall@5 {recall:.2f}")
+            small_db.clear()
+
+        # The reducer and the full vectors survive a save, and a crash of a durable store
+        durable_reduced = SimpleVectorDB.open_durable(os.path.join(reduce_dir, "durable"))
+        durable_reduced.add_many(reduce_texts[:1000])
+        durable_reduced.attach_reducer(PCAReducer(16), os.path.join(reduce_dir, "full.f32"),
+                                       rerank=200)
+        durable_reduced.add_many(reduce_texts[1000:])   # logged with full vectors
+        expected = [r["id"] for r in durable_reduced.search(reduce_queries[30], top_k=5)]
+        durable_reduced.save(os.path.join(reduce_dir, "saved"))
+        durable_reduced.close()
+        for label, reopened in [
+            ("save() + open()", SimpleVectorDB.open(os.path.join(reduce_dir, "saved"))),
+            ("WAL recovery", SimpleVectorDB.open_durable(os.path.join(reduce_dir, "durable"))),
+        ]:
+            same = [r["id"] for r in reopened.search(reduce_queries[30], top_k=5)] == expected
+            print(f"{label:<16} {len(reopened)} docs, {reopened.vectors.shape[1]}-dim, "
+                  f"same results: {same}")
+            reopened.close()
+    print("(Random fake embeddings have no low-rank structure; real ones keep far more signal.)")
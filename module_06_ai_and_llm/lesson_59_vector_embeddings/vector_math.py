@@ -0,0 +1,116 @@
+"""
+Lesson 59: Vector Embeddings — Shared NumPy Helpers
+
+Small building blocks reused by the vector store and its indexes.
+"""
+
+import numpy as np
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first, without a full sort."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    idx = np.argpartition(-scores, k - 1)[:k]
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
+
+def normalize_rows(x: np.ndarray) -> np.ndarray:
+    """Scale every row to unit length (zero rows are left as zeros)."""
+    norms = np.linalg.norm(x, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return x / norms
+
+
+def normalize(vec: np.ndarray) -> np.ndarray:
+    """Unit-length copy of a single vector."""
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm > 0 else vec
+
+
+def row_norms(x: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+    """L2 norm of every row, computed without a squared temporary matrix."""
+    x = np.asarray(x)
+    out = np.einsum("ij,ij->i", x, x, out=out)
+    return np.sqrt(out, out=out)
+
+
+def cosine_one_to_many(query: np.ndarray, matrix: np.ndarray, norms: np.ndarray = None,
+                       out: np.ndarray = None, dtype=np.float32) -> np.ndarray:
+    """
+    Cosine similarity between `query` (d,) and every row of `matrix` (n, d).
+    Reuse `norms` (row_norms(matrix)) and an `out` buffer across queries; zero rows score 0.
+    """
+    matrix = np.asarray(matrix, dtype=dtype)
+    query = np.asarray(query, dtype=dtype)
+    if norms is None:
+        norms = row_norms(matrix)
+    out = np.matmul(matrix, query, out=out)
+    np.divide(out, norms, out=out, where=norms > 0)
+    q_norm = np.linalg.norm(query)
+    if q_norm > 0:
+        out /= q_norm
+    return out
+
+
+def cosine_many_to_many(a: np.ndarray, b: np.ndarray, a_norms: np.ndarray = None,
+                        b_norms: np.ndarray = None, out: np.ndarray = None,
+                        dtype=np.float32) -> np.ndarray:
+    """(m, n) cosine similarities between the rows of `a` (m, d) and `b` (n, d)."""
+    same = b is a
+    a = np.asarray(a, dtype=dtype)
+    b = a if same else np.asarray(b, dtype=dtype)
+    if a_norms is None:
+        a_norms = row_norms(a)
+    if b_norms is None:
+        b_norms = a_norms if same else row_norms(b)
+    out = np.matmul(a, b.T, out=out)
+    np.divide(out, a_norms[:, None], out=out, where=a_norms[:, None] > 0)
+    np.divide(out, b_norms[None, :], out=out, where=b_norms[None, :] > 0)
+    return out
+
+
+def top_k_per_row(scores: np.ndarray, k: int) -> np.ndarray:
+    """Batched top_k_indices: (n_queries, n) scores -> (n_queries, k) column indices."""
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return np.empty((len(scores), 0), dtype=np.intp)
+    idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, idx, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(idx, order, axis=1)
+
+
+def running_top_k(blocks, queries: np.ndarray, k: int) -> tuple:
+    """
+    Exact top-k over rows that arrive in blocks: `blocks` yields (start_row,
+    block) pairs and only the k best rows per query are kept in between, so
+    memory does not grow with the number of rows. Returns (rows, scores) of
+    shape (n_queries, <= k), best first.
+    """
+    best_rows = np.empty((len(queries), 0), dtype=np.int64)
+    best_scores = np.empty((len(queries), 0), dtype=np.float32)
+    for start, block in blocks:
+        scores = queries @ block.T
+        rows = np.broadcast_to(np.arange(start, start + len(block)), scores.shape)
+        # Previous winners + this block, re-selected
+        scores = np.concatenate([best_scores, scores], axis=1)
+        rows = np.concatenate([best_rows, rows], axis=1)
+        keep = top_k_per_row(scores, k)
+        best_scores = np.take_along_axis(scores, keep, axis=1)
+        best_rows = np.take_along_axis(rows, keep, axis=1)
+    return best_rows, best_scores
+
+
+def reciprocal_rank_fusion(rankings: list, k: int = 60) -> tuple:
+    """
+    Merge several best-first lists of ids: score(id) = sum of 1 / (k + rank).
+    Only ranks matter, so lists with incomparable scores (BM25 vs cosine)
+    can be combined. Returns (ids, fused_scores), best first.
+    """
+    fused = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            fused[item] = fused.get(item, 0.0) + 1.0 / (k + rank)
+    ordered = sorted(fused.items(), key=lambda kv: kv[1], reverse=True)
+    return [item for item, _ in ordered], [score for _, score in ordered]
@@ -0,0 +1,213 @@
+"""
+Lesson 59: Vector Embeddings — Write-Ahead Log and Snapshots
+
+An in-memory store loses everything on a crash, and rebuilding it means
+paying for every embedding again. The classic database fix:
+
+1. Before a change is applied, append it (with its vector) to a log file
+2. fsync the log at most every `fsync_interval` seconds; a crash loses at
+   most that window (a process crash loses nothing: records are flushed
+   to the OS on every append). A background thread fsyncs records that
+   are still pending once writes stop, so the window holds when idle too
+3. Every so often write a full snapshot and start a new log file; older
+   logs and snapshots are deleted
+4. Recovery = load the newest snapshot + replay only the log records after it
+
+Directory layout:
+    CURRENT                      {"snapshot": "snapshot-000000000042", "lsn": 42}
+    snapshot-000000000042/       a SimpleVectorDB.save() directory
+    wal-000000000043.log         records with lsn >= 43
+
+Record layout (little-endian):
+    u32 payload length | u32 crc32(payload) | payload
+    payload = u64 lsn | u32 header length | JSON header | float32 vector bytes
+
+A torn or corrupt record at the end of the log (crash mid-write) fails the
+length/CRC check; replay stops there and the file is truncated to the last
+good record.
+"""
+
+import json
+import os
+import shutil
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path
+
+import numpy as np
+
+CURRENT_FILE = "CURRENT"
+_FRAME = struct.Struct("<II")     # payload length, crc32
+_PAYLOAD = struct.Struct("<QI")   # lsn, header length
+
+
+def _fsync_dir(path: Path):
+    if hasattr(os, "O_DIRECTORY"):   # directory fsync makes renames durable (POSIX only)
+        fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+class WriteAheadLog:
+    """Append-only operation log plus the CURRENT snapshot pointer for one directory."""
+
+    def __init__(self, directory, fsync_interval: float = 1.0):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.fsync_interval = fsync_interval
+        self.snapshot_name, self.snapshot_lsn = None, 0
+        current = self.directory / CURRENT_FILE
+        if current.exists():
+            pointer = json.loads(current.read_text(encoding="utf-8"))
+            self.snapshot_name, self.snapshot_lsn = pointer["snapshot"], pointer["lsn"]
+        self.lsn = self.snapshot_lsn
+        self.replayed = 0
+        self._file = None
+        self._last_sync = time.monotonic()
+        self._lock = threading.Lock()    # the flusher thread syncs the same file
+        self._dirty = False              # records written since the last fsync
+        self._stop = threading.Event()
+        self._flusher = None
+
+    @property
+    def snapshot_path(self):
+        return None if self.snapshot_name is None else self.directory / self.snapshot_name
+
+    def _log_files(self) -> list:
+        return sorted(self.directory.glob("wal-*.log"))
+
+    # -- recovery ---------------------------------------------------------
+
+    def replay(self):
+        """
+        Yield (header dict, vector or None) for every record after the snapshot,
+        in log order. Must be exhausted before append() is called.
+        """
+        files = self._log_files()
+        for i, log_path in enumerate(files):
+            good_end = 0
+            with open(log_path, "rb") as f:
+                while True:
+                    frame = f.read(_FRAME.size)
+                    if len(frame) < _FRAME.size:
+                        break
+                    length, crc = _FRAME.unpack(frame)
+                    payload = f.read(length)
+                    if len(payload) < length or zlib.crc32(payload) != crc:
+                        break
+                    good_end = f.tell()
+                    lsn, header_len = _PAYLOAD.unpack_from(payload)
+                    if lsn <= self.lsn:
+                        continue   # already contained in the snapshot
+                    body = payload[_PAYLOAD.size:]
+                    header = json.loads(body[:header_len])
+                    vector = np.frombuffer(body[header_len:], dtype=np.float32)
+                    self.lsn = lsn
+                    self.replayed += 1
+                    yield header, (vector if len(vector) else None)
+            if good_end < log_path.stat().st_size:
+                # Torn tail: cut it off; anything in later files cannot be trusted either
+                with open(log_path, "r+b") as f:
+                    f.truncate(good_end)
+                for later in files[i + 1:]:
+                    later.unlink()
+                break
+
+    # -- logging ----------------------------------------------------------
+
+    def _open_log(self):
+        files = self._log_files()
+        path = files[-1] if files else self.directory / f"wal-{self.lsn + 1:012d}.log"
+        self._file = open(path, "ab")
+
+    def append(self, header: dict, vector: np.ndarray = None) -> int:
+        """Write one record and return its log sequence number."""
+        body = json.dumps(header, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        vec = b"" if vector is None else np.asarray(vector, dtype=np.float32).tobytes()
+        with self._lock:
+            if self._file is None:
+                self._open_log()
+            lsn = self.lsn + 1
+            payload = _PAYLOAD.pack(lsn, len(body)) + body + vec
+            self._file.write(_FRAME.pack(len(payload), zlib.crc32(payload)) + payload)
+            self._file.flush()
+            self.lsn = lsn
+            self._dirty = True
+            if time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._fsync()
+            elif self._flusher is None:
+                self._stop.clear()
+                self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+                self._flusher.start()
+        return lsn
+
+    def _flush_loop(self):
+        # Without this, the last records before writes stop would only be
+        # fsynced by the next append() or close(): an unbounded loss window
+        while not self._stop.wait(self.fsync_interval):
+            with self._lock:
+                if self._dirty:
+                    self._fsync()
+
+    def _fsync(self):
+        """fsync the current log file (caller holds the lock)."""
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        self._dirty = False
+        self._last_sync = time.monotonic()
+
+    def sync(self):
+        with self._lock:
+            self._fsync()
+
+    # -- snapshots --------------------------------------------------------
+
+    def snapshot_dir(self, lsn: int) -> Path:
+        return self.directory / f"snapshot-{lsn:012d}"
+
+    def publish_snapshot(self, lsn: int):
+        """
+        Point CURRENT at snapshot_dir(lsn) (already fully written), start a new
+        log file and delete the logs and snapshots it makes obsolete.
+        """
+        name = self.snapshot_dir(lsn).name
+        # Make the snapshot's renamed files, then its own directory entry,
+        # durable before CURRENT may point at it
+        _fsync_dir(self.snapshot_dir(lsn))
+        _fsync_dir(self.directory)
+        tmp = self.directory / (CURRENT_FILE + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"snapshot": name, "lsn": lsn}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.directory / CURRENT_FILE)
+        _fsync_dir(self.directory)
+        self.snapshot_name, self.snapshot_lsn = name, lsn
+
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+            old_logs = self._log_files()
+            self._file = open(self.directory / f"wal-{lsn + 1:012d}.log", "ab")
+            self._dirty = False
+        for path in old_logs:   # every record in them is <= lsn
+            path.unlink()
+        for path in self.directory.glob("snapshot-*"):
+            if path.name != name:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def close(self):
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            self._flusher = None
+        with self._lock:
+            if self._file is not None:
+                self._fsync()
+                self._file.close()
+                self._file = None